@@ -0,0 +1,113 @@
+"""
+Local load test for sign-up and login, in the spirit of a small locust run.
+
+Usage: python benchmarks/auth_load.py [--users 8] [--seconds 10] [--login-ratio 0.8]
+
+Simulated users hammer /sign-up and /login through Flask test clients on
+concurrent threads and the script reports, per endpoint, requests per second,
+latency percentiles and SQL queries per request. It runs against a throwaway
+SQLite file unless DATABASE_URL is set. PASSWORD_HASH_METHOD defaults to a cheap
+pbkdf2 cost so the numbers show request overhead; set it to measure real hashing.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'auth_load.db')
+
+from sqlalchemy import event
+from website import create_app, db
+
+PASSWORD = 'benchmark-password'
+
+_local = threading.local()
+_results = defaultdict(list)
+_results_lock = threading.Lock()
+
+
+def count_queries(conn, cursor, statement, parameters, context, executemany):
+    _local.queries = getattr(_local, 'queries', 0) + 1
+
+
+def timed(name, send):
+    _local.queries = 0
+    started = time.perf_counter()
+    response = send()
+    elapsed = time.perf_counter() - started
+    ok = response.status_code < 400
+    with _results_lock:
+        _results[name].append((elapsed, _local.queries, ok))
+
+
+def simulated_user(app, worker, deadline, login_ratio, accounts):
+    client = app.test_client()
+    serial = 0
+    while time.perf_counter() < deadline:
+        if accounts and random.random() < login_ratio:
+            email = random.choice(accounts)
+            timed('login', lambda: client.post('/login', data={'email': email, 'password': PASSWORD}))
+            client.get('/logout')
+        else:
+            serial += 1
+            name = f'load{worker}x{serial}x{random.randrange(10 ** 6)}'
+            email = f'{name}@example.com'
+            timed('sign-up', lambda: client.post('/sign-up', data={
+                'email': email, 'username': name, 'password1': PASSWORD, 'password2': PASSWORD,
+            }))
+            client.get('/logout')
+            with _results_lock:
+                accounts.append(email)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--login-ratio', type=float, default=0.8)
+    args = parser.parse_args()
+
+    app = create_app({'SECRET_KEY': 'benchmark'})
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_queries)
+
+    accounts = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=simulated_user, args=(app, worker, deadline, args.login_ratio, accounts))
+        for worker in range(args.users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.users} users for {elapsed:.1f}s against {os.environ['DATABASE_URL']}")
+    print(f"{'endpoint':<10}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'queries/req':>13}")
+    for name, samples in sorted(_results.items()):
+        latencies = [sample[0] for sample in samples]
+        queries = sum(sample[1] for sample in samples) / len(samples)
+        errors = sum(1 for sample in samples if not sample[2])
+        print(
+            f"{name:<10}{len(samples):>9}{errors:>8}{len(samples) / elapsed:>9.1f}"
+            f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}{queries:>13.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
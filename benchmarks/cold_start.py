@@ -0,0 +1,63 @@
+"""
+Cold-start timing of the production entry point.
+
+Usage: python benchmarks/cold_start.py [--runs 5]
+
+Starts fresh interpreters that import wsgi.py and serve one /readyz request,
+with and without the schema bootstrap, and reports median import + app setup
+time, time to the first response and the bootstrap cost. Runs against a
+throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import wsgi
+response = wsgi.app.test_client().get('/readyz')
+startup = wsgi.app.extensions['startup']
+print(json.dumps({
+    "status": response.status_code,
+    "load_seconds": startup['load_seconds'],
+    "bootstrap_seconds": startup['bootstrap_seconds'],
+    "first_response_seconds": time.perf_counter() - started,
+}))
+"""
+
+
+def run_probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cold_start.db'))
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'bootstrap-db'], cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+
+    print(f"{'mode':<22}{'status':>7}{'load s':>9}{'bootstrap s':>13}{'first response s':>18}")
+    for mode, bootstrap in (('worker (no bootstrap)', '0'), ('bootstrap on start', '1')):
+        samples = [run_probe(dict(env, DB_AUTO_BOOTSTRAP=bootstrap)) for _ in range(args.runs)]
+        bootstrap_times = [s['bootstrap_seconds'] for s in samples if s['bootstrap_seconds'] is not None]
+        print(f"{mode:<22}{samples[-1]['status']:>7}"
+              f"{statistics.median(s['load_seconds'] for s in samples):>9.3f}"
+              f"{statistics.median(bootstrap_times) if bootstrap_times else 0:>13.3f}"
+              f"{statistics.median(s['first_response_seconds'] for s in samples):>18.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Password hashing throughput: how many logins per second per core each scheme allows.
+
+Usage: python benchmarks/password_hashing.py [method ...]
+  e.g. python benchmarks/password_hashing.py pbkdf2:sha256 scrypt argon2
+
+Each method is timed verifying a known password on one thread, then through the
+app's bounded pool (PASSWORD_HASH_WORKERS / PASSWORD_HASH_EXECUTOR) under load.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website import passwords
+
+PASSWORD = 'correct horse battery staple'
+DURATION_SECONDS = float(os.environ.get('BENCH_SECONDS', 3))
+
+
+def verify_rate(verify, stored_hash, clients):
+    """Verifications per second with `clients` concurrent callers for DURATION_SECONDS."""
+    deadline = time.perf_counter() + DURATION_SECONDS
+
+    def worker():
+        done = 0
+        while time.perf_counter() < deadline:
+            if not verify(stored_hash, PASSWORD):
+                raise RuntimeError('verification failed')
+            done += 1
+        return done
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        total = sum(f.result() for f in [pool.submit(worker) for _ in range(clients)])
+    return total / (time.perf_counter() - started)
+
+
+def main():
+    methods = sys.argv[1:] or [passwords.PASSWORD_HASH_METHOD]
+    cores = os.cpu_count() or 1
+    workers = passwords.PASSWORD_HASH_WORKERS
+    print(f"{cores} cores, {workers} {passwords.PASSWORD_HASH_EXECUTOR} workers, {DURATION_SECONDS:g}s per run")
+    print(f"{'method':<28}{'hash len':>9}{'1 thread/s':>12}{'pool/s':>10}{'per core/s':>12}")
+
+    for method in methods:
+        method = passwords.normalize_method(method)
+        try:
+            stored_hash = passwords._hash(PASSWORD, method)
+        except ImportError:
+            print(f"{method:<28} skipped (argon2-cffi is not installed)")
+            continue
+        single = verify_rate(passwords._verify, stored_hash, 1)
+        pooled = verify_rate(passwords.verify_password, stored_hash, min(workers * 2, passwords.PASSWORD_HASH_MAX_PENDING))
+        print(f"{method:<28}{len(stored_hash):>9}{single:>12.1f}{pooled:>10.1f}{pooled / min(workers, cores):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Post search latency against document frequency.
+
+Usage: python benchmarks/search_latency.py [--posts 200000] [--queries 50] [--seed 1]
+
+Seeds posts whose words follow a Zipf-like distribution, so a few terms are
+in a large share of posts and most are rare, builds the search index and times
+search_posts() for common, medium and rare single terms and for two-term
+queries. Reports each term class's document frequency and p50/p95 latency;
+with the candidate cap, common terms should cost about what rare ones do.
+Runs against in-memory SQLite unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+VOCABULARY = [f"word{i}" for i in range(2000)]
+INSERT_BATCH = 1000
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def seed_posts(count, rng):
+    from website import db
+    from website.models import User, Post
+    from website.search import rebuild_post_index
+
+    db.session.execute(User.__table__.insert(), [
+        {"id": i, "email": f"search{i}@example.com", "username": f"search{i}", "password": "x"}
+        for i in range(1, 101)
+    ])
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    start = datetime(2024, 1, 1)
+    for first in range(0, count, INSERT_BATCH):
+        db.session.execute(Post.__table__.insert(), [
+            {"user_id": rng.randint(1, 100), "content": ' '.join(rng.choices(VOCABULARY, weights, k=12)),
+             "date": start + timedelta(minutes=i)}
+            for i in range(first, min(first + INSERT_BATCH, count))
+        ])
+    db.session.commit()
+    started = time.perf_counter()
+    rebuild_post_index()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from sqlalchemy import func
+    from website import create_app, db
+    from website.models import PostTerm
+    from website.search import search_posts
+
+    app = create_app({'SECRET_KEY': 'benchmark'})
+    rng = random.Random(args.seed)
+    with app.app_context():
+        index_seconds = seed_posts(args.posts, rng)
+        print(f"{args.posts} posts indexed in {index_seconds:.1f}s")
+
+        doc_freqs = dict(db.session.query(PostTerm.term, func.count(PostTerm.post_id)).group_by(PostTerm.term).all())
+        by_frequency = sorted(doc_freqs, key=doc_freqs.get, reverse=True)
+        classes = {
+            "common": by_frequency[:5],
+            "medium": by_frequency[len(by_frequency) // 10:len(by_frequency) // 10 + 5],
+            "rare": by_frequency[-5:],
+        }
+        queries = {name: [(term,) for term in terms] for name, terms in classes.items()}
+        queries["common+rare"] = list(zip(classes["common"], classes["rare"]))
+
+        print(f"{'query':<14}{'doc freq':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, term_sets in queries.items():
+            samples = []
+            for i in range(args.queries):
+                terms = term_sets[i % len(term_sets)]
+                started = time.perf_counter()
+                search_posts(' '.join(terms))
+                samples.append((time.perf_counter() - started) * 1000)
+                db.session.rollback()
+            freq = statistics.median(max(doc_freqs[t] for t in terms) for terms in term_sets)
+            print(f"{name:<14}{freq:>10.0f}{percentile(samples, 0.5):>9.1f}{percentile(samples, 0.95):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
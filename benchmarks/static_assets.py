@@ -0,0 +1,61 @@
+"""
+Image bytes per exercise library page, before and after the variant pipeline.
+
+Usage: python benchmarks/static_assets.py [--card-width 350]
+
+Builds the variants of every library image into a throwaway directory, then
+compares what a browser downloads for the /exercises cards: the original JPEGs
+against the variant srcset would pick for a card at 1x and 2x pixel density, as
+JPEG and as WebP. Requires Pillow. Runs against in-memory SQLite unless
+DATABASE_URL is set.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('ASSET_BUILD_DIR', tempfile.mkdtemp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--card-width', type=int, default=350, help="rendered card width in CSS pixels")
+    args = parser.parse_args()
+
+    from website import create_app, db
+    from website.assets import ASSET_BUILD_DIR, STATIC_DIR, build_image_variants
+    from website.models import ExerciseLibrary
+    from website.views import populate_sample_exercises
+
+    app = create_app({'SECRET_KEY': 'benchmark'})
+    with app.app_context():
+        if ExerciseLibrary.query.first() is None:
+            populate_sample_exercises()
+        rows = db.session.query(ExerciseLibrary.image_url).filter(ExerciseLibrary.image_url.isnot(None)).distinct()
+        names = sorted(row.image_url for row in rows)
+    entries = {name: build_image_variants(name) for name in names}
+
+    def picked_bytes(fmt, density):
+        total = 0
+        for entry in entries.values():
+            needed = args.card_width * density
+            variants = entry["variants"][fmt]
+            filename = next((f for w, f in variants if w >= needed), variants[-1][1])
+            total += os.path.getsize(os.path.join(ASSET_BUILD_DIR, filename))
+        return total
+
+    original = sum(os.path.getsize(os.path.join(STATIC_DIR, name)) for name in names)
+    print(f"{len(names)} library image(s), {args.card_width}px cards")
+    print(f"{'variant':<16}{'bytes':>10}{'reduction':>11}")
+    print(f"{'original':<16}{original:>10}{'1.0x':>11}")
+    for fmt in ('jpeg', 'webp'):
+        for density in (1, 2):
+            size = picked_bytes(fmt, density)
+            print(f"{f'{fmt} @{density}x':<16}{size:>10}{f'{original / size:.1f}x':>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""
+Endpoint benchmark suite over a seeded synthetic database.
+
+Usage: python benchmarks/suite.py [--users 200] [--posts 2000] [--requests 50] [--output results.json]
+       python benchmarks/suite.py --compare benchmarks/results/before.json
+
+Seeds users, posts, comments, likes, exercises and chat messages with bulk inserts
+(a fixed --seed gives the same data every run), then drives the real routes through
+the Flask test client as a logged-in user, with the AI client replaced by
+FakeChatClient. For each endpoint it reports latency percentiles, SQL queries per
+request and peak Python memory allocated per request, and writes everything to a
+JSON file that a later run can --compare against.
+
+Runs against a throwaway SQLite file unless DATABASE_URL (or --database) is set.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = (
+    "squat deadlift bench press plank core cardio run sprint mobility stretch yoga "
+    "protein recovery sleep streak hiit cycling swim rowing kettlebell pushup pullup "
+    "lunge burpee form tempo warmup cooldown endurance strength goal progress"
+).split()
+PASSWORD = 'benchmark-password'
+INSERT_BATCH = 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help="SQLAlchemy URL; defaults to DATABASE_URL or a temporary SQLite file")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--comments-per-post', type=int, default=5)
+    parser.add_argument('--likes-per-post', type=int, default=10)
+    parser.add_argument('--exercises-per-user', type=int, default=60)
+    parser.add_argument('--chat-messages-per-user', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=50, help="timed requests per endpoint")
+    parser.add_argument('--memory-requests', type=int, default=5, help="extra requests per endpoint traced for memory")
+    parser.add_argument('--only', help="comma-separated endpoint names to run")
+    parser.add_argument('--output', help="JSON results path; defaults to benchmarks/results/<timestamp>.json")
+    parser.add_argument('--compare', help="earlier JSON results to diff against")
+    return parser.parse_args()
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def insert_rows(table, rows):
+    from website import db
+    for start in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(table.insert(), rows[start:start + INSERT_BATCH])
+    db.session.commit()
+
+
+def seed_database(args):
+    """Fill an empty database with reproducible synthetic data. Returns the row counts."""
+    from website.models import User, Post, Comment, Like, Exercise, ChatMessage
+    from website.passwords import hash_password
+    from website.stats import rebuild_daily_activity
+    from website.search import rebuild_post_index
+    from website.views import populate_sample_exercises
+    from website.catalogue import get_catalogue, invalidate_catalogue
+
+    if not get_catalogue().entries:
+        populate_sample_exercises()
+        invalidate_catalogue()
+    if User.query.first() is not None:
+        print("Database already has users; benchmarking the existing data.")
+        return None
+
+    rng = random.Random(args.seed)
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    password = hash_password(PASSWORD)
+
+    insert_rows(User.__table__, [
+        {"id": i, "email": f"bench{i}@example.com", "username": f"bench{i}", "password": password,
+         "date_joined": now - timedelta(days=rng.randint(30, 720))}
+        for i in range(1, args.users + 1)
+    ])
+    user_ids = range(1, args.users + 1)
+
+    library = get_catalogue().entries
+    insert_rows(Exercise.__table__, [
+        {"user_id": user_id, "title": entry.name, "exercise_type": entry.exercise_type,
+         "duration_minutes": rng.randint(10, 60), "calories_burned": rng.randint(40, 600),
+         "date_completed": now - timedelta(days=rng.randint(0, 180), minutes=rng.randint(0, 1440))}
+        for user_id in user_ids
+        for entry in (rng.choice(library) for _ in range(args.exercises_per_user))
+    ])
+
+    posts, comments, likes = [], [], []
+    for post_id in range(1, args.posts + 1):
+        posted = now - timedelta(minutes=(args.posts - post_id) * 7)
+        likers = rng.sample(user_ids, min(args.likes_per_post, args.users))
+        posts.append({"id": post_id, "user_id": rng.choice(user_ids), "content": sentence(rng, 20), "date": posted,
+                      "likes_count": len(likers), "comments_count": args.comments_per_post})
+        likes.extend({"user_id": user_id, "post_id": post_id} for user_id in likers)
+        comments.extend(
+            {"user_id": rng.choice(user_ids), "post_id": post_id, "content": sentence(rng, 8),
+             "date": posted + timedelta(minutes=n + 1)}
+            for n in range(args.comments_per_post)
+        )
+    insert_rows(Post.__table__, posts)
+    insert_rows(Comment.__table__, comments)
+    insert_rows(Like.__table__, likes)
+
+    insert_rows(ChatMessage.__table__, [
+        {"user_id": user_id, "message": sentence(rng, 10), "sender": 'user' if n % 2 == 0 else 'bot', "status": 'done',
+         "date": now - timedelta(minutes=(args.chat_messages_per_user - n) * 3)}
+        for user_id in user_ids
+        for n in range(args.chat_messages_per_user)
+    ])
+
+    rebuild_daily_activity()
+    rebuild_post_index()
+    return {
+        "users": args.users, "posts": len(posts), "comments": len(comments), "likes": len(likes),
+        "exercises": args.users * args.exercises_per_user,
+        "chat_messages": args.users * args.chat_messages_per_user,
+    }
+
+
+def endpoints(rng, post_count):
+    """(name, method, path factory, request kwargs) for every benchmarked route."""
+    def post_id():
+        return rng.randint(1, max(post_count, 1))
+
+    return [
+        ('home', 'GET', lambda: '/', {}),
+        ('exercises', 'GET', lambda: '/exercises', {}),
+        ('exercises_filtered', 'GET', lambda: '/exercises?difficulty=Beginner&equipment=no', {}),
+        ('exercise_detail', 'GET', lambda: '/exercise/1', {}),
+        ('dashboard', 'GET', lambda: '/dashboard', {}),
+        ('community', 'GET', lambda: '/community', {}),
+        ('feed_api', 'GET', lambda: '/api/feed?limit=20', {}),
+        ('post_comments_api', 'GET', lambda: f'/api/posts/{post_id()}/comments', {}),
+        ('like_api', 'POST', lambda: f'/api/posts/{post_id()}/like', {}),
+        ('search', 'GET', lambda: f'/search?q={rng.choice(WORDS)}+{rng.choice(WORDS)}', {}),
+        ('search_api', 'GET', lambda: f'/api/search?q={rng.choice(WORDS)}', {}),
+        ('chat_messages_api', 'GET', lambda: '/api/chat/messages?after_id=0', {}),
+        ('send_message', 'POST', lambda: '/send-message',
+         {"data": {"message": "How many rest days should I take?"}, "headers": {"Accept": "application/json"}}),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * fraction)))]
+
+
+def run_endpoint(client, counter, method, path, kwargs, args):
+    def send():
+        return client.open(path(), method=method, **kwargs)
+
+    for _ in range(3):
+        send()
+
+    latencies, queries, statuses = [], [], {}
+    for _ in range(args.requests):
+        counter[0] = 0
+        started = time.perf_counter()
+        response = send()
+        latencies.append(time.perf_counter() - started)
+        queries.append(counter[0])
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(args.memory_requests):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+
+    return {
+        "requests": len(latencies),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+        "peak_alloc_kb": round(max(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    print(f"{'endpoint':<20}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'queries':>9}{'alloc KB':>10}")
+    for name, row in results.items():
+        line = (f"{name:<20}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                f"{row['queries_per_request']:>9.1f}{row['peak_alloc_kb'] or 0:>10.1f}")
+        old = (baseline or {}).get(name)
+        if old:
+            change = (row['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+            line += f"   p50 {change:+.0f}%, queries {row['queries_per_request'] - old['queries_per_request']:+.1f}"
+        print(line)
+
+
+def main():
+    args = parse_args()
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    elif 'DATABASE_URL' not in os.environ:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    # Request cost, not password hashing cost, is what this suite measures
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+    from sqlalchemy import event
+    from website import create_app, db
+    from website.ai_agent import FakeChatClient, set_client
+
+    set_client(FakeChatClient())
+    app = create_app({'SECRET_KEY': 'benchmark', 'AI_CHAT_INLINE': True})
+
+    with app.app_context():
+        started = time.perf_counter()
+        seeded = seed_database(args)
+        seed_seconds = time.perf_counter() - started
+        from website.models import Post
+        post_count = Post.query.count()
+        dialect = db.engine.dialect.name
+        counter = [0]
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: counter.__setitem__(0, counter[0] + 1))
+
+    client = app.test_client()
+    response = client.post('/login', data={'email': 'bench1@example.com', 'password': PASSWORD})
+    if response.status_code != 302:
+        sys.exit("Could not log in as bench1@example.com; run against an empty database or one this script seeded.")
+
+    only = set(args.only.split(',')) if args.only else None
+    rng = random.Random(args.seed)
+    results = {}
+    for name, method, path, kwargs in endpoints(rng, post_count):
+        if only and name not in only:
+            continue
+        results[name] = run_endpoint(client, counter, method, path, kwargs, args)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": dialect,
+            "seed": args.seed,
+            "seeded_rows": seeded,
+            "seed_seconds": round(seed_seconds, 2),
+            "requests_per_endpoint": args.requests,
+        },
+        "endpoints": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["endpoints"]
+    print_table(results, baseline)
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
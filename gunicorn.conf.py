@@ -0,0 +1,49 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is imported once in the master (preload_app) and forked into workers,
+# so imports and template/config setup aren't repeated per worker.
+#
+# Sizing: each worker runs `threads` request threads. Community pages keep a
+# server-sent event stream open, and every stream holds a thread (but no DB
+# connection) for up to COMMUNITY_STREAM_SECONDS. At most COMMUNITY_MAX_STREAMS
+# of them run per worker (half the threads by default); further viewers are
+# told to retry later, so the other half always serves normal requests. Size
+# DB_POOL_SIZE + DB_MAX_OVERFLOW to cover threads - COMMUNITY_MAX_STREAMS.
+# Roughly workers * COMMUNITY_MAX_STREAMS viewers get live updates at once.
+# Streamed chat replies also hold a thread while the model answers; at most
+# AI_MAX_STREAMS of them run per worker (a quarter of the threads by default)
+# and the rest get a busy reply, so chat can't take the threads community needs.
+#
+# With more than one worker, live updates go through Redis
+# (COMMUNITY_EVENTS_BACKEND defaults to redis); the app refuses to start with
+# the in-process broker.
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# Read by the app when it is preloaded below: the event backend and stream limits depend on them
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ.setdefault('COMMUNITY_MAX_STREAMS', str(max(1, threads // 2)))
+os.environ.setdefault('AI_MAX_STREAMS', str(max(1, threads // 4)))
+worker_class = 'gthread'
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Connections the master opened while preloading must not be shared with the forked workers
+    from wsgi import app
+    from website import db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,55 @@
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pytest
+from website import create_app, db
+
+
+@pytest.fixture
+def app():
+    from website.catalogue import invalidate_catalogue
+    from website.fragment_cache import fragment_cache
+    from website import identity, search
+    # Every test gets a fresh in-memory database, so nothing cached per process may outlive it
+    invalidate_catalogue()
+    fragment_cache.clear()
+    identity._identities.clear()
+    search._doc_freqs.clear()
+    search._post_total = (0, 0.0)
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test'})
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    from website.models import User
+
+    def make_user(username, **fields):
+        user = User(email=f'{username}@example.com', username=username, password='x', **fields)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting the SQL statements run inside it."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, 'after_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', record)
+    return count_queries
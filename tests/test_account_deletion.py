@@ -0,0 +1,29 @@
+from website import bootstrap_database, db
+from website.models import AccountDeletion, Post, User
+
+
+def test_landing_page_follows_the_deletion_job(app, make_user):
+    app.config['ACCOUNT_DELETION_INLINE'] = True
+    user = make_user('alice')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+    response = client.post('/delete-account', data={'confirm': 'DELETE'}, follow_redirects=True)
+
+    job = AccountDeletion.query.one()
+    assert f'data-status-url="/account-deletion/{job.token}"' in response.get_data(as_text=True)
+    assert client.get(f'/account-deletion/{job.token}').get_json()['status'] == 'done'
+
+
+def test_bootstrap_resumes_unfinished_deletions(app, make_user):
+    app.config['ACCOUNT_DELETION_INLINE'] = True
+    user = make_user('alice')
+    db.session.add(Post(user_id=user.id, content='hello'))
+    db.session.add(AccountDeletion(user_id=user.id, token='interrupted', status='running', stage='posts'))
+    db.session.commit()
+
+    bootstrap_database(app)
+
+    assert AccountDeletion.query.one().status == 'done'
+    assert User.query.count() == 0 and Post.query.count() == 0
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+from website.ai_agent import cache_key
+
+
+def turn(sender, message):
+    return SimpleNamespace(sender=sender, message=message)
+
+
+def test_same_question_in_different_conversations_gets_different_keys():
+    running = [turn('user', 'I want to train for a marathon'), turn('bot', 'Build mileage slowly.')]
+    lifting = [turn('user', 'I want to get stronger'), turn('bot', 'Focus on compound lifts.')]
+    question = 'How many days a week should I train?'
+
+    assert cache_key(question, running) != cache_key(question, lifting)
+    assert cache_key(question, running) == cache_key(question, list(running))
+
+
+def test_summary_is_part_of_the_key():
+    history = [turn('user', 'hello'), turn('bot', 'Hi!')]
+    question = 'What should I eat after training?'
+    assert cache_key(question, history, 'Vegan runner') != cache_key(question, history, 'Powerlifter')
+
+
+class DownRedis:
+    def get(self, key):
+        raise ConnectionError('Redis is down')
+
+    def set(self, key, value, ex=None):
+        raise ConnectionError('Redis is down')
+
+
+def test_redis_cache_fails_open(monkeypatch):
+    import sys
+    from website.ai_agent import RedisCache
+    monkeypatch.setitem(sys.modules, 'redis', SimpleNamespace(Redis=SimpleNamespace(from_url=lambda url: DownRedis())))
+    cache = RedisCache()
+
+    assert cache.get('key') is None
+    cache.set('key', 'reply')
+    assert cache.stats() == {"hits": 0, "misses": 1, "bypassed": 0, "errors": 2, "size": None}
@@ -0,0 +1,13 @@
+from website.assets import AssetManifest
+
+
+def test_manifest_writers_keep_each_others_entries(tmp_path):
+    first = AssetManifest(str(tmp_path))
+    second = AssetManifest(str(tmp_path))
+    assert second.get('a.jpg') is None  # loaded before the other worker wrote
+
+    first.set('a.jpg', {"source": "1"})
+    second.set('b.jpg', {"source": "2"})
+
+    assert AssetManifest(str(tmp_path)).load() == {"a.jpg": {"source": "1"}, "b.jpg": {"source": "2"}}
+    assert second.get('a.jpg') == {"source": "1"}
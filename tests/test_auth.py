@@ -0,0 +1,56 @@
+from werkzeug.security import generate_password_hash
+from website import auth, db
+from website.passwords import HashingBusy
+
+
+def test_login_succeeds_when_the_rehash_is_busy(app, make_user, monkeypatch):
+    user = make_user('alice')
+    user.password = generate_password_hash('correct horse', method='pbkdf2:sha256')
+    db.session.commit()
+    old_hash = user.password
+
+    def busy(password):
+        raise HashingBusy()
+    monkeypatch.setattr(auth, 'needs_rehash', lambda stored_hash: True)
+    monkeypatch.setattr(auth, 'hash_password', busy)
+
+    response = app.test_client().post('/login', data={'email': 'alice@example.com', 'password': 'correct horse'})
+
+    assert response.status_code == 302
+    assert db.session.get(type(user), user.id).password == old_hash
+
+
+def test_unique_violation_is_mapped_by_key_not_by_value():
+    from types import SimpleNamespace
+    from website.auth import unique_violation_message
+
+    def violation(text):
+        return SimpleNamespace(orig=Exception(text))
+    mysql = "(1062, \"Duplicate entry 'my_email_fan' for key 'user.username'\")"
+    assert unique_violation_message(violation(mysql)) == 'Username already exists.'
+    mysql57 = "(1062, \"Duplicate entry 'username@x.io' for key 'email'\")"
+    assert unique_violation_message(violation(mysql57)) == 'Email already exists.'
+    assert unique_violation_message(violation('UNIQUE constraint failed: user.email')) == 'Email already exists.'
+    assert unique_violation_message(violation("Key (username)=(email) already exists.")) == 'Username already exists.'
+    assert unique_violation_message(violation("for key 'uq_user_email'")) == 'Email already exists.'
+
+
+def test_sign_up_race_reports_the_username(app, make_user, monkeypatch):
+    make_user('email_lover')
+    monkeypatch.setattr(auth, 'find_taken_identity', lambda email, username: None)
+    client = app.test_client()
+    client.post('/sign-up', data={
+        'email': 'new@example.com', 'username': 'email_lover',
+        'password1': 'a long enough password 1', 'password2': 'a long enough password 1',
+    })
+    with client.session_transaction() as session:
+        assert session['_flashes'] == [('error', 'Username already exists.')]
+
+
+def test_taken_identity_is_decided_by_the_database(app, make_user):
+    from website.auth import find_taken_identity
+    make_user('alice')
+    make_user('bob')
+    assert find_taken_identity('alice@example.com', 'bob') == 'Email already exists.'
+    assert find_taken_identity('new@example.com', 'bob') == 'Username already exists.'
+    assert find_taken_identity('new@example.com', 'carol') is None
@@ -0,0 +1,5 @@
+def test_exercise_filters_show_facet_counts(app):
+    html = app.test_client().get('/exercises').get_data(as_text=True)
+    assert 'Beginner (' in html
+    assert 'Strength (2)' in html
+    assert 'No Equipment (3)' in html
@@ -0,0 +1,73 @@
+import threading
+
+from website import ai_agent, db
+from website.chat_jobs import BUSY_REPLY, stream_reply
+from website.models import ChatMessage
+
+
+class RecordingClient(ai_agent.FakeChatClient):
+    """Notes whether a database transaction is open while the model is streaming."""
+
+    def stream_updates(self):
+        self.in_transaction = db.session().in_transaction()
+        yield from super().stream_updates()
+
+
+def pending_message(user):
+    message = ChatMessage(user_id=user.id, message='How often should I train?', sender='user', status='pending')
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+
+def test_no_transaction_is_held_while_the_model_streams(app, make_user, monkeypatch):
+    client = RecordingClient(reply='Three times a week.')
+    monkeypatch.setattr(ai_agent, '_client', client)
+    monkeypatch.setattr(ai_agent, '_cache', None)
+    monkeypatch.setattr(ai_agent, '_cache_configured', True)
+    message = pending_message(make_user('alice'))
+
+    events = list(stream_reply(message, slots=threading.BoundedSemaphore(1)))
+
+    assert client.in_transaction is False
+    assert events[-1].startswith('event: done')
+    assert ChatMessage.query.get(message.id).status == 'answered'
+
+
+def test_streams_beyond_the_limit_get_a_busy_reply(app, make_user, monkeypatch):
+    client = ai_agent.FakeChatClient()
+    monkeypatch.setattr(ai_agent, '_client', client)
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    message = pending_message(make_user('alice'))
+
+    events = list(stream_reply(message, slots=slots))
+
+    assert len(events) == 1 and events[0].startswith('event: busy')
+    assert client.calls == 0
+    assert ChatMessage.query.get(message.id).status == 'failed'
+    assert ChatMessage.query.filter_by(sender='bot').one().message == BUSY_REPLY
+
+
+class DeletingClient(ai_agent.FakeChatClient):
+    """Deletes the question while the model is answering, as an account deletion would."""
+
+    def complete(self, messages, stream=False, **kwargs):
+        self.in_transaction = db.session().in_transaction()
+        ChatMessage.query.filter_by(sender='user').delete()
+        db.session.commit()
+        return super().complete(messages, stream=stream, **kwargs)
+
+
+def test_reply_job_reloads_the_message_after_the_model_call(app, make_user, monkeypatch):
+    from website.chat_jobs import run_reply_job
+    client = DeletingClient()
+    monkeypatch.setattr(ai_agent, '_client', client)
+    monkeypatch.setattr(ai_agent, '_cache', None)
+    monkeypatch.setattr(ai_agent, '_cache_configured', True)
+    message_id = pending_message(make_user('alice')).id
+
+    run_reply_job(app, message_id)
+
+    assert client.in_transaction is False
+    assert ChatMessage.query.count() == 0
@@ -0,0 +1,95 @@
+import pytest
+from website.community_events import MemoryBroker, check_backend, event_stream
+
+
+def test_memory_backend_is_refused_with_several_workers():
+    check_backend('memory', workers=1)
+    check_backend('redis', workers=4)
+    with pytest.raises(RuntimeError):
+        check_backend('memory', workers=4)
+
+
+def test_stream_sends_reset_when_the_backlog_moved_on():
+    broker = MemoryBroker(backlog=2)
+    for i in range(5):
+        broker.publish('like', {"post_id": i})
+    chunks = list(event_stream(broker, '1', duration=1))
+    assert chunks[-1].startswith('id: 5\nevent: reset')
+
+
+def test_feed_api_renders_cards_for_a_refresh(app, make_user):
+    from website import db
+    from website.models import Post
+    user = make_user('alice')
+    db.session.add(Post(user_id=user.id, content='Leg day done'))
+    db.session.commit()
+    data = app.test_client().get('/api/feed?format=html').get_json()
+    assert 'Leg day done' in data['html']
+    assert len(data['posts']) == 1
+
+
+def test_comments_api_renders_the_owners_delete_control(app, make_user):
+    from website import db
+    from website.models import Comment, Post
+    alice, bob = make_user('alice'), make_user('bob')
+    post = Post(user_id=alice.id, content='Rest day')
+    db.session.add(post)
+    db.session.commit()
+    db.session.add_all([Comment(user_id=alice.id, post_id=post.id, content='mine'),
+                        Comment(user_id=bob.id, post_id=post.id, content='theirs')])
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(alice.id)
+    data = client.get(f'/api/posts/{post.id}/comments').get_json()
+
+    own, other = sorted(data['html'], key=lambda html: 'mine' not in html)
+    assert 'delete-comment' in own
+    assert 'delete-comment' not in other
+
+
+def test_streams_beyond_the_limit_are_told_to_retry():
+    import threading
+    from website.community_events import BUSY_RETRY_MS, limited_event_stream
+    broker = MemoryBroker()
+    slots = threading.BoundedSemaphore(1)
+    first = limited_event_stream(broker, '0', slots=slots)
+    assert next(first).startswith('retry: 3000\n')
+    assert list(limited_event_stream(broker, '0', slots=slots)) == [f"retry: {BUSY_RETRY_MS}\n\n"]
+    first.close()
+    second = limited_event_stream(broker, '0', slots=slots)
+    assert next(second).startswith('retry: 3000\n')
+    second.close()
+
+
+class DownBroker(MemoryBroker):
+    def ping(self):
+        raise ConnectionError("connection refused")
+
+
+def test_unreachable_broker_stops_startup_and_readiness(app):
+    from website.community_events import check_broker, set_broker
+    set_broker(DownBroker())
+    try:
+        with pytest.raises(RuntimeError):
+            check_broker()
+        response = app.test_client().get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['checks']['events'] == 'error: ConnectionError'
+    finally:
+        set_broker(None)
+    assert app.test_client().get('/readyz').get_json()['checks']['events'] == 'ok'
+
+
+def test_redis_backend_without_redis_installed_fails_fast(monkeypatch):
+    import sys
+    from website import community_events
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    monkeypatch.setattr(community_events, 'COMMUNITY_EVENTS_BACKEND', 'redis')
+    community_events.set_broker(None)
+    try:
+        with pytest.raises(RuntimeError, match='redis'):
+            community_events.check_broker()
+    finally:
+        community_events.set_broker(None)
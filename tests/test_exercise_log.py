@@ -0,0 +1,16 @@
+from datetime import datetime
+import pytest
+from website.exercise_log import SessionError, parse_completed_at
+
+NOW = datetime(2026, 10, 18, 23, 30)
+
+
+def test_dates_up_to_the_end_of_the_local_day_are_accepted():
+    assert parse_completed_at('2026-10-18T23:59', NOW) == datetime(2026, 10, 18, 23, 59)
+    assert parse_completed_at('2026-10-18', NOW) == datetime(2026, 10, 18)
+
+
+@pytest.mark.parametrize('value', ['2026-10-19', '2026-10-19T00:10', '2026-10-18T23:30:00-01:00'])
+def test_dates_after_the_local_day_are_rejected(value):
+    with pytest.raises(SessionError):
+        parse_completed_at(value, NOW)
@@ -0,0 +1,47 @@
+from website import db
+from website.models import Comment, Like, Post
+
+
+def add_posts(users, count):
+    for i in range(count):
+        author = users[i % len(users)]
+        post = Post(user_id=author.id, content=f'post {i}', likes_count=len(users), comments_count=2)
+        db.session.add(post)
+        db.session.flush()
+        db.session.add_all(Like(user_id=user.id, post_id=post.id) for user in users)
+        db.session.add_all(Comment(user_id=user.id, post_id=post.id, content='nice') for user in users[:2])
+    db.session.commit()
+
+
+def feed_queries(app, count_queries, viewer):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(viewer.id)
+    client.get('/community')  # warm the identity cache
+    with count_queries() as statements:
+        response = client.get('/community')
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_feed_query_count_does_not_grow_with_posts(app, make_user, count_queries):
+    users = [make_user(f'user{i}') for i in range(3)]
+    add_posts(users, 1)
+    one_post = feed_queries(app, count_queries, users[0])
+
+    add_posts(users, 14)
+    many_posts = feed_queries(app, count_queries, users[0])
+
+    assert Post.query.count() == 15
+    assert one_post == many_posts
+
+
+def test_comment_on_a_missing_post_is_not_found(app, make_user):
+    from website.models import Comment
+    user = make_user('alice')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    response = client.post('/add-comment/999', data={'content': 'nice'})
+    assert response.status_code == 404
+    assert Comment.query.count() == 0
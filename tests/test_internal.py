@@ -0,0 +1,45 @@
+import pytest
+from website import internal
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setenv('INTERNAL_TOKEN', 'secret')
+    return app.test_client()
+
+
+def test_loopback_requests_need_the_token(client):
+    assert client.get('/internal/pool').status_code == 404
+    assert client.get('/internal/pool', headers={'X-Internal-Token': 'wrong'}).status_code == 404
+    assert client.get('/internal/pool', headers={'X-Internal-Token': 'secret'}).status_code == 200
+
+
+def test_loopback_trust_is_opt_in(client, monkeypatch):
+    monkeypatch.setattr(internal, 'INTERNAL_TRUST_LOOPBACK', True)
+    assert client.get('/internal/pool', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 200
+    assert client.get('/internal/pool', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 404
+
+
+def test_metrics_include_chat_time_to_first_token(client, monkeypatch):
+    from website import chat_jobs
+    monkeypatch.setattr(chat_jobs, 'ttft_samples', type(chat_jobs.ttft_samples)(range(1, 101), maxlen=1000))
+    body = client.get('/internal/metrics', headers={'X-Internal-Token': 'secret'}).get_data(as_text=True)
+    assert 'fitfusion_chat_ttft_seconds{quantile="0.5"} 0.051' in body
+    assert 'fitfusion_chat_ttft_seconds{quantile="0.95"} 0.096' in body
+    assert 'fitfusion_chat_ttft_seconds_count 100' in body
+
+
+def test_metrics_include_the_ai_reply_cache(client, monkeypatch):
+    from website import ai_agent
+    cache = ai_agent.MemoryCache()
+    cache.set('key', 'reply')
+    cache.get('key')
+    cache.get('other')
+    cache.bypass()
+    monkeypatch.setattr(ai_agent, '_cache', cache)
+    monkeypatch.setattr(ai_agent, '_cache_configured', True)
+    body = client.get('/internal/metrics', headers={'X-Internal-Token': 'secret'}).get_data(as_text=True)
+    assert 'fitfusion_ai_cache_hits_total 1' in body
+    assert 'fitfusion_ai_cache_misses_total 1' in body
+    assert 'fitfusion_ai_cache_bypassed_total 1' in body
+    assert 'fitfusion_ai_cache_entries 1' in body
@@ -0,0 +1,25 @@
+import threading
+import pytest
+from website import passwords
+from website.passwords import HashingBusy, run_bounded
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(passwords, '_slots', slots)
+    monkeypatch.setattr(passwords, 'PASSWORD_HASH_TIMEOUT_SECONDS', 0.05)
+    return slots
+
+
+def test_timeout_raises_busy_and_keeps_the_slot_until_the_hash_ends(one_slot):
+    release = threading.Event()
+    with pytest.raises(HashingBusy):
+        run_bounded(release.wait, 5)
+    # The abandoned hash is still running, so its slot is still taken
+    with pytest.raises(HashingBusy):
+        run_bounded(len, 'x')
+    release.set()
+    assert one_slot.acquire(timeout=1)
+    one_slot.release()
+    assert run_bounded(len, 'abc') == 3
@@ -0,0 +1,24 @@
+from sqlalchemy import inspect, text
+from website import db
+from website.models import Exercise
+from website.schema import foreign_key_changes
+
+
+def test_foreign_keys_created_without_cascade_are_found(app):
+    Exercise.__table__.drop(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE exercise (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES user (id), "
+            "title VARCHAR(100), duration_minutes INTEGER, calories_burned INTEGER, "
+            "exercise_type VARCHAR(100), date_completed DATETIME)"
+        ))
+    existing = inspect(db.engine).get_foreign_keys('exercise')
+
+    changes = foreign_key_changes(Exercise.__table__, existing)
+
+    assert [constraint.ondelete for _, constraint in changes] == ['CASCADE']
+
+
+def test_up_to_date_foreign_keys_are_left_alone(app):
+    existing = inspect(db.engine).get_foreign_keys('exercise')
+    assert foreign_key_changes(Exercise.__table__, existing) == []
@@ -0,0 +1,39 @@
+from datetime import datetime
+from website import db
+from website.models import Post
+from website.search import index_post, search_posts
+
+
+def add_post(user, content):
+    post = Post(user_id=user.id, content=content)
+    db.session.add(post)
+    index_post(post)
+    db.session.commit()
+    return post
+
+
+def test_posts_of_deleted_accounts_are_not_found(make_user):
+    alice, bob = make_user('alice'), make_user('bob', deleted_at=datetime(2024, 1, 1))
+    kept = add_post(alice, 'Deadlift form tips')
+    add_post(bob, 'Deadlift personal best')
+    add_post(alice, 'Morning run by the river')
+
+    posts, has_more = search_posts('deadlift')
+
+    assert [post.id for post in posts] == [kept.id]
+    assert not has_more
+
+
+def test_ranking_reads_a_bounded_candidate_set(make_user, monkeypatch):
+    from website import search
+    alice = make_user('alice')
+    posts = [add_post(alice, f'squat session {i}') for i in range(5)]
+    strong = add_post(alice, 'squat squat squat and more squat')
+
+    monkeypatch.setattr(search, 'MAX_CANDIDATES_PER_TERM', 3)
+    monkeypatch.setattr(search, 'COMMON_TERM_RATIO', 1.0)
+    found, has_more = search.search_posts('squat')
+
+    # Heaviest posting first, then the newest on equal weight; older ones fall outside the cap
+    assert [post.id for post in found] == [strong.id, posts[4].id, posts[3].id]
+    assert not has_more
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from website import db
+from website.models import DailyActivity, Exercise
+from website.stats import rebuild_daily_activity
+
+
+def test_rebuild_daily_activity_writes_every_batch(make_user):
+    users = [make_user(f'user{i}') for i in range(3)]
+    start = datetime(2024, 1, 1, 9, 0)
+    db.session.add_all(
+        Exercise(user_id=user.id, title='Run', duration_minutes=30, calories_burned=300,
+                 date_completed=start + timedelta(days=day, hours=hour))
+        for user in users for day in range(9) for hour in (0, 5)
+    )
+    db.session.commit()
+
+    written = rebuild_daily_activity(batch_size=4)
+
+    assert written == 27
+    assert DailyActivity.query.count() == 27
+    assert {row.sessions for row in DailyActivity.query} == {2}
+
+
+def test_rebuild_daily_activity_for_one_user(make_user):
+    alice, bob = make_user('alice'), make_user('bob')
+    for user in (alice, bob):
+        db.session.add_all(Exercise(user_id=user.id, title='Run', duration_minutes=10, calories_burned=100,
+                                    date_completed=datetime(2024, 2, day, 8)) for day in range(1, 6))
+    db.session.commit()
+    rebuild_daily_activity()
+
+    assert rebuild_daily_activity(user_id=alice.id, batch_size=2) == 5
+    assert DailyActivity.query.count() == 10
+
+
+def test_dashboard_ignores_activity_dated_after_today(app, make_user):
+    from website.stats import get_monthly_trend, get_streaks, get_weekly_trend, local_today
+    user = make_user('alice')
+    today = local_today()
+    db.session.add_all([
+        DailyActivity(user_id=user.id, day=today, sessions=1, minutes=20, calories=200),
+        DailyActivity(user_id=user.id, day=today + timedelta(days=1), sessions=1, minutes=30, calories=300),
+    ])
+    db.session.commit()
+
+    assert sum(week["sessions"] for week in get_weekly_trend(user.id)) == 1
+    assert sum(month["sessions"] for month in get_monthly_trend(user.id)) == 1
+    assert get_streaks(user.id)["current_streak"] == 1
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    assert client.get('/dashboard').status_code == 200
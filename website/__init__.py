@@ -1,60 +1,187 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
 import pymysql
 import os
+import time
+from .config import database_uri, engine_options, env_int, env_bool
+
+MYSQL_UNKNOWN_DATABASE = 1049
 
 db = SQLAlchemy()
 
-DB_USER = "root"
-DB_PASSWORD = "Czechoslovakia"
-DB_HOST = "localhost"
-DB_PORT = 3306
-DB_NAME = "fitness_tracker"
+def ensure_database_exists(app):
+    """
+    Create the MySQL database named in the URI if the server doesn't have it yet.
 
-def ensure_database_exists():
+    Goes through the app's pooled engine first, so the usual case costs no extra
+    connection; only an "unknown database" error opens a raw server connection.
+    """
+    uri = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if not uri.drivername.startswith('mysql'):
+        return
+    try:
+        with db.engine.connect():
+            return
+    except OperationalError as e:
+        if not e.orig or e.orig.args[0] != MYSQL_UNKNOWN_DATABASE:
+            print(f"Database connection error: {e}")
+            raise
     try:
         conn = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT
+            host=uri.host,
+            user=uri.username,
+            password=uri.password,
+            port=uri.port or 3306,
+            connect_timeout=env_int('DB_CONNECT_TIMEOUT', 10)
         )
         conn.autocommit(True)
         cursor = conn.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}`")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{uri.database}`")
         cursor.close()
         conn.close()
-        print(f"Database '{DB_NAME}' ensured.")
+        print(f"Database '{uri.database}' ensured.")
     except Exception as e:
         print(f"Database connection error: {e}")
         raise
 
-def create_app():
-    ensure_database_exists()
+def bootstrap_database(app):
+    """
+    One-time schema setup: create the database and tables, apply column and index
+    changes, backfill derived tables that are still empty and resume account
+    deletions a restart interrupted.
+
+    Safe to run repeatedly, but meant to run once per deploy (`flask bootstrap-db`)
+    rather than in every worker; see DB_AUTO_BOOTSTRAP.
+    """
+    from .models import Exercise, DailyActivity, Post, PostTerm
+    from .schema import sync_columns, sync_indexes, sync_foreign_keys, widen_string_columns
+    from .counters import reconcile_post_counters
+    from .stats import rebuild_daily_activity
+    from .search import rebuild_post_index
+    from .account_deletion import resume_account_deletions
+    started = time.perf_counter()
+    with app.app_context():
+        ensure_database_exists(app)
+        db.create_all()
+        new_columns = sync_columns()
+        if any(table == 'post' for table, _ in new_columns):
+            reconcile_post_counters()
+        widen_string_columns()
+        sync_indexes()
+        sync_foreign_keys()
+        if DailyActivity.query.first() is None and Exercise.query.first() is not None:
+            rebuild_daily_activity()
+        if PostTerm.query.first() is None and Post.query.first() is not None:
+            rebuild_post_index()
+        resumed = resume_account_deletions(background=True)
+        if resumed:
+            print(f"Resumed {resumed} account deletion job(s).")
+    app.extensions['startup']['bootstrap_seconds'] = round(time.perf_counter() - started, 4)
 
+def create_app(config=None):
+    """
+    Build the app. The schema is bootstrapped here unless DB_AUTO_BOOTSTRAP is off
+    (app config or environment), which production workers should set after running
+    `flask bootstrap-db` once.
+    """
+    started = time.perf_counter()
     app = Flask(__name__)
+    app.extensions['startup'] = {'bootstrap_seconds': None}
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
     db.init_app(app)
 
+    from .community_events import check_backend, check_broker
+    check_backend()
+    check_broker()
+
+    from .instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    from .fragment_cache import FragmentCacheExtension
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+    from .assets import assets, image_url, image_srcset, responsive_image
+    app.add_template_global(image_url)
+    app.add_template_global(image_srcset)
+    app.add_template_global(responsive_image)
+
     from .views import views
     from .auth import auth
+    from .internal import internal
 
     app.register_blueprint(views, url_prefix='/')
     app.register_blueprint(auth, url_prefix='/')
+    app.register_blueprint(internal, url_prefix='/internal')
+    app.register_blueprint(assets)
 
-    from .models import User 
-    with app.app_context():
-        db.create_all()
+    from .counters import reconcile_post_counters
+    from .stats import rebuild_daily_activity
+    from .search import rebuild_post_index
+    if app.config.get('DB_AUTO_BOOTSTRAP', env_bool('DB_AUTO_BOOTSTRAP', True)):
+        bootstrap_database(app)
+
+    @app.cli.command('bootstrap-db')
+    def bootstrap_db_command():
+        """Create the database and tables, apply column/index changes and backfill derived data."""
+        started = time.perf_counter()
+        bootstrap_database(app)
+        print(f"Database ready in {time.perf_counter() - started:.2f}s.")
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Recompute post like/comment counters from the Like and Comment tables."""
+        fixed = reconcile_post_counters()
+        print(f"Reconciled counters on {fixed} post(s).")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Recompute the per-user daily activity rollup from logged exercises."""
+        written = rebuild_daily_activity()
+        print(f"Wrote {written} daily activity row(s).")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the full-text index over community posts."""
+        indexed = rebuild_post_index()
+        print(f"Indexed {indexed} post(s).")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Build resized, content-hashed variants of every exercise library image."""
+        from .assets import build_image_variants
+        from .models import ExerciseLibrary
+        rows = db.session.query(ExerciseLibrary.image_url).filter(ExerciseLibrary.image_url.isnot(None)).distinct()
+        names = sorted(row.image_url for row in rows)
+        for name in names:
+            build_image_variants(name)
+        print(f"Built variants for {len(names)} image(s).")
+
+    @app.cli.command('resume-account-deletions')
+    def resume_account_deletions_command():
+        """Finish account deletions interrupted by a restart."""
+        from .account_deletion import resume_account_deletions
+        ran = resume_account_deletions()
+        print(f"Ran {ran} account deletion job(s).")
 
+    from .identity import load_identity
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
     @login_manager.user_loader
     def load_user(id):
-        return User.query.get(int(id))
+        return load_identity(int(id))
 
+    from .health import health, record_first_request
+    app.register_blueprint(health)
+    record_first_request(app, started)
+    app.extensions['startup']['create_app_seconds'] = round(time.perf_counter() - started, 4)
     return app
\ No newline at end of file
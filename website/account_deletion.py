@@ -0,0 +1,172 @@
+import os
+import secrets
+import threading
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from website import db
+from .models import (
+    AccountDeletion, User, Exercise, DailyActivity, Post, PostTerm, Comment, Like,
+    ChatMessage, ChatSummary, local_now,
+)
+
+DELETE_BATCH_SIZE = int(os.environ.get('DELETE_BATCH_SIZE', 500))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='account-deletion')
+    return _executor
+
+
+def schedule_account_deletion(user_id):
+    """
+    Deactivate a user straight away and queue the removal of their data.
+
+    The user row is marked deleted so logins and session loads stop at once; the
+    rows themselves are removed by run_deletion_job in the background. Set
+    ACCOUNT_DELETION_INLINE in the app config to delete synchronously.
+    Returns the AccountDeletion job that tracks progress.
+    """
+    User.query.filter_by(id=user_id).update({User.deleted_at: local_now()}, synchronize_session=False)
+    job = AccountDeletion(user_id=user_id, token=secrets.token_urlsafe(24))
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    if app.config.get('ACCOUNT_DELETION_INLINE'):
+        run_deletion_job(app, job.id)
+    else:
+        get_executor().submit(run_deletion_job, app, job.id)
+    return job
+
+
+def run_deletion_job(app, job_id):
+    with app.app_context():
+        try:
+            job = AccountDeletion.query.get(job_id)
+            if job is None or job.status == 'done':
+                return
+            job.status = 'running'
+            job.error = None
+            db.session.commit()
+            delete_user_data(job)
+            job.status = 'done'
+            job.stage = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Account deletion {job_id} failed: {e}")
+            traceback.print_exc()
+            job = AccountDeletion.query.get(job_id)
+            if job is not None:
+                job.status = 'failed'
+                job.error = str(e)[:500]
+                db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def resume_account_deletions(background=False):
+    """
+    Run every unfinished deletion job to completion, e.g. after a restart; with
+    `background`, queue them on the deletion executor instead (unless
+    ACCOUNT_DELETION_INLINE is set). Returns how many were found.
+    """
+    app = current_app._get_current_object()
+    job_ids = [row[0] for row in db.session.query(AccountDeletion.id).filter(AccountDeletion.status != 'done').all()]
+    for job_id in job_ids:
+        if background and not app.config.get('ACCOUNT_DELETION_INLINE'):
+            get_executor().submit(run_deletion_job, app, job_id)
+        else:
+            run_deletion_job(app, job_id)
+    return len(job_ids)
+
+
+def delete_user_data(job):
+    """
+    Remove everything owned by job.user_id in bounded batches, one short transaction each.
+
+    Likes and comments on other people's posts are removed first so their counters can
+    be adjusted; then the user's posts with everything attached to them; then the
+    remaining per-user tables and finally the user row. Every step is idempotent, so a
+    failed job can simply be run again.
+    """
+    user_id = job.user_id
+
+    set_stage(job, 'likes')
+    delete_in_batches(job, Like, Like.user_id == user_id, counter=Post.likes_count)
+
+    set_stage(job, 'comments')
+    delete_in_batches(job, Comment, Comment.user_id == user_id, counter=Post.comments_count)
+
+    set_stage(job, 'posts')
+    while True:
+        post_ids = [row[0] for row in db.session.query(Post.id).filter(Post.user_id == user_id).limit(DELETE_BATCH_SIZE).all()]
+        if not post_ids:
+            break
+        delete_in_batches(job, Like, Like.post_id.in_(post_ids))
+        delete_in_batches(job, Comment, Comment.post_id.in_(post_ids))
+        # A post's terms are bounded by its 500-character content, so they go in one statement
+        remove_rows(job, PostTerm, PostTerm.post_id.in_(post_ids))
+        remove_rows(job, Post, Post.id.in_(post_ids))
+
+    for stage, model in (
+        ('exercises', Exercise),
+        ('daily_activity', DailyActivity),
+        ('chat_messages', ChatMessage),
+        ('chat_summary', ChatSummary),
+    ):
+        set_stage(job, stage)
+        delete_in_batches(job, model, model.user_id == user_id)
+
+    set_stage(job, 'user')
+    remove_rows(job, User, User.id == user_id)
+
+
+def delete_in_batches(job, model, condition, counter=None):
+    """
+    Delete rows matching `condition`, at most DELETE_BATCH_SIZE per transaction.
+
+    Ids are selected first and deleted by primary key, which works on MySQL (no LIMIT
+    in DELETE subqueries) and keeps each lock set small. With `counter`, the matching
+    Post counter is decremented for every deleted row, grouped by the row's post_id.
+    """
+    columns = [model.id, model.post_id] if counter is not None else [model.id]
+    while True:
+        rows = db.session.query(*columns).filter(condition).limit(DELETE_BATCH_SIZE).all()
+        if not rows:
+            return
+        if counter is not None:
+            for post_id, count in Counter(row[1] for row in rows).items():
+                Post.query.filter_by(id=post_id).update({counter: counter - count}, synchronize_session=False)
+        remove_rows(job, model, model.id.in_([row[0] for row in rows]))
+
+
+def remove_rows(job, model, condition):
+    deleted = model.query.filter(condition).delete(synchronize_session=False)
+    job.rows_deleted += deleted
+    db.session.commit()
+    return deleted
+
+
+def set_stage(job, stage):
+    job.stage = stage
+    db.session.commit()
+
+
+def job_to_dict(job):
+    return {
+        "status": job.status,
+        "stage": job.stage,
+        "rows_deleted": job.rows_deleted,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
@@ -1,12 +1,37 @@
 import os
+import re
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
 from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage, AssistantMessage
 import traceback
 from azure.core.credentials import AzureKeyCredential
 
-client = ChatCompletionsClient(
-    endpoint="https://models.github.ai/inference",
-    credential=AzureKeyCredential(os.environ["GITHUB_TOKEN"]),
+AI_ENDPOINT = os.environ.get('AI_ENDPOINT', "https://models.github.ai/inference")
+AI_MODEL = os.environ.get('AI_MODEL', "gpt-4o")
+AI_TIMEOUT_SECONDS = float(os.environ.get('AI_TIMEOUT_SECONDS', 20))
+
+AI_CACHE_BACKEND = os.environ.get('AI_CACHE_BACKEND', 'memory')
+AI_CACHE_TTL_SECONDS = int(os.environ.get('AI_CACHE_TTL_SECONDS', 3600))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 1024))
+AI_CACHE_REDIS_URL = os.environ.get('AI_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+# How many of the most recent (trimmed) history messages take part in the cache key, with the summary
+AI_CACHE_CONTEXT_MESSAGES = int(os.environ.get('AI_CACHE_CONTEXT_MESSAGES', 4))
+
+# Approximate token budget for the conversation history sent with each question
+AI_CONTEXT_TOKEN_BUDGET = int(os.environ.get('AI_CONTEXT_TOKEN_BUDGET', 800))
+# Longest a single history message may be before it is clipped
+AI_CONTEXT_MESSAGE_TOKENS = int(os.environ.get('AI_CONTEXT_MESSAGE_TOKENS', 200))
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a user and a fitness assistant in at most "
+    "three sentences. Keep the user's goals, constraints and anything they were advised. "
+    "If a previous summary is given, merge it into the new one."
 )
 
 SYSTEM_PROMPT = (
@@ -18,41 +43,388 @@ SYSTEM_PROMPT = (
     " Always answer in 1-2 sentences. They do not need to be complicated answers."
 )
 
-def ask_ai(user_text, chat_history):
+FALLBACK_REPLY = "I'm having trouble connecting right now. Please try again later."
+TIMEOUT_REPLY = "My response is taking longer than expected. Please try again."
+
+_client = None
+_cache = None
+_cache_configured = False
+
+# Words that point back at earlier turns; with history present they make a question context-dependent
+CONTEXT_WORDS = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "he", "she",
+    "more", "again", "else", "instead", "also", "same", "above", "previous", "why",
+}
+
+
+class EmptyResponseError(Exception):
+    pass
+
+
+class FakeChatClient:
     """
-    user_text: the latest user message (string)
-    chat_history: list of ChatMessage objects from DB
+    Stand-in for ChatCompletionsClient that answers locally, for development and load tests.
+
+    Enabled with AI_FAKE_CLIENT=1; AI_FAKE_DELAY adds a simulated model latency in seconds.
     """
-    try:
-        messages = [SystemMessage(content=SYSTEM_PROMPT)]
 
-        recent_history = chat_history[-10:] if len(chat_history) > 10 else chat_history
+    def __init__(self, reply="Stay consistent and start with a few sets a day.", delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+
+    def complete(self, messages, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self.stream_updates()
+        if self.delay:
+            time.sleep(self.delay)
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def stream_updates(self):
+        words = self.reply.split(' ')
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay / len(words))
+            text = word if i == len(words) - 1 else word + ' '
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class MemoryCache:
+    """In-process reply cache with a per-entry TTL and least-recently-used eviction."""
+
+    def __init__(self, max_entries=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def bypass(self):
+        with self.lock:
+            self.bypassed += 1
 
-        for msg in recent_history:
-            if msg.sender == "user":
-                messages.append(UserMessage(content=msg.message))
-            elif msg.sender == "bot":
-                messages.append(AssistantMessage(content=msg.message))
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed, "errors": 0,
+                    "size": len(self.entries)}
 
-        messages.append(UserMessage(content=user_text))
 
-        response = client.complete(
-            messages=messages,
-            model="gpt-4o",
-            temperature=0.7,
-            max_tokens=150
+class RedisCache:
+    """
+    Reply cache stored in Redis (or anything speaking its protocol), shared by all workers.
+
+    Expiry is delegated to Redis; LRU eviction follows the server's maxmemory-policy.
+    Fails open: while Redis is unreachable every lookup is a miss and nothing is stored.
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url=AI_CACHE_REDIS_URL, ttl=AI_CACHE_TTL_SECONDS, prefix='ai-reply:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"AI cache read failed: {e}")
+            value = None
+            with self.lock:
+                self.errors += 1
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return value.decode('utf-8')
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+        except Exception as e:
+            print(f"AI cache write failed: {e}")
+            with self.lock:
+                self.errors += 1
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+    def bypass(self):
+        with self.lock:
+            self.bypassed += 1
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed, "errors": self.errors,
+                    "size": None}
+
+
+def get_cache():
+    """The reply cache selected by AI_CACHE_BACKEND ('memory', 'redis' or 'none'), or None."""
+    global _cache, _cache_configured
+    if not _cache_configured:
+        if AI_CACHE_BACKEND == 'memory':
+            _cache = MemoryCache()
+        elif AI_CACHE_BACKEND == 'redis':
+            _cache = RedisCache()
+        _cache_configured = True
+    return _cache
+
+
+def set_cache(cache):
+    """Swap the reply cache; pass None to disable caching."""
+    global _cache, _cache_configured
+    _cache = cache
+    _cache_configured = True
+
+
+def normalize_question(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def is_context_dependent(user_text, chat_history):
+    """
+    Whether the answer may depend on earlier turns, in which case the cache is bypassed.
+
+    Any question that follows earlier messages and refers back to them ("why is that?",
+    "more like it") or is too short to stand on its own counts as context-dependent.
+    """
+    if not chat_history:
+        return False
+    words = normalize_question(user_text).split()
+    return len(words) < 3 or any(word in CONTEXT_WORDS for word in words)
+
+
+def cache_key(user_text, chat_history, summary=None):
+    """
+    Hash of the model, the question and its context: the conversation summary plus the
+    last AI_CACHE_CONTEXT_MESSAGES turns as trimmed for the prompt, so a reply is only
+    reused within the same conversation state.
+    """
+    context = []
+    if summary:
+        context.append(["summary", normalize_question(summary)])
+    if AI_CACHE_CONTEXT_MESSAGES > 0:
+        context.extend(
+            [sender, normalize_question(text)]
+            for sender, text in pack_history(chat_history)[-AI_CACHE_CONTEXT_MESSAGES:]
         )
+    payload = json.dumps([AI_MODEL, normalize_question(user_text), context])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_lookup(user_text, chat_history, summary=None):
+    """Return (cache, key, cached_reply); cache and key are None when caching is off or bypassed."""
+    cache = get_cache()
+    if cache is None:
+        return None, None, None
+    if is_context_dependent(user_text, chat_history):
+        cache.bypass()
+        return None, None, None
+    key = cache_key(user_text, chat_history, summary)
+    return cache, key, cache.get(key)
 
-        if response and response.choices and len(response.choices) > 0:
-            return response.choices[0].message.content
+
+def get_client():
+    """The shared inference client, created on first use so importing this module needs no token."""
+    global _client
+    if _client is None:
+        if os.environ.get('AI_FAKE_CLIENT') == '1':
+            _client = FakeChatClient(delay=float(os.environ.get('AI_FAKE_DELAY', 0)))
         else:
-            print("AI returned empty response")
-            return "I'm having trouble connecting right now. Please try again later."
-    
+            _client = ChatCompletionsClient(
+                endpoint=AI_ENDPOINT,
+                credential=AzureKeyCredential(os.environ["GITHUB_TOKEN"]),
+            )
+    return _client
+
+
+def set_client(client):
+    """Swap the inference client, e.g. for a FakeChatClient in tests."""
+    global _client
+    _client = client
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token), good enough for budgeting."""
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def clip_to_tokens(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    text = text or ""
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+def pack_history(chat_history, budget=AI_CONTEXT_TOKEN_BUDGET, per_message=AI_CONTEXT_MESSAGE_TOKENS):
+    """
+    Pick the newest messages whose (clipped) text fits in `budget` tokens.
+
+    Returns (sender, text) pairs oldest first. Packing stops at the first message that
+    doesn't fit so the context is always a contiguous tail of the conversation.
+    """
+    packed = []
+    used = 0
+    for msg in reversed(chat_history):
+        if msg.sender not in ("user", "bot"):
+            continue
+        text = clip_to_tokens(msg.message, per_message)
+        cost = estimate_tokens(text)
+        if used + cost > budget:
+            break
+        packed.append((msg.sender, text))
+        used += cost
+    packed.reverse()
+    return packed
+
+
+def build_messages(user_text, chat_history, summary=None):
+    messages = [SystemMessage(content=SYSTEM_PROMPT)]
+    if summary:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+
+    for sender, text in pack_history(chat_history):
+        if sender == "user":
+            messages.append(UserMessage(content=text))
+        else:
+            messages.append(AssistantMessage(content=text))
+
+    messages.append(UserMessage(content=user_text))
+    return messages
+
+
+def summarize(previous_summary, chat_history, timeout=AI_TIMEOUT_SECONDS):
+    """Fold older messages into a rolling conversation summary. Raises on failure."""
+    lines = []
+    if previous_summary:
+        lines.append(f"Previous summary: {previous_summary}")
+    for sender, text in pack_history(chat_history, budget=AI_CONTEXT_TOKEN_BUDGET * 2):
+        lines.append(f"{'User' if sender == 'user' else 'Assistant'}: {text}")
+
+    response = get_client().complete(
+        messages=[SystemMessage(content=SUMMARY_PROMPT), UserMessage(content="\n".join(lines))],
+        model=AI_MODEL,
+        temperature=0.2,
+        max_tokens=150,
+        timeout=timeout
+    )
+    if response and response.choices and len(response.choices) > 0:
+        return response.choices[0].message.content
+    raise EmptyResponseError("AI returned empty summary")
+
+
+def complete(user_text, chat_history, timeout=AI_TIMEOUT_SECONDS, summary=None):
+    """
+    Ask the model for a reply and return its text.
+
+    Unlike ask_ai this raises on failure (including EmptyResponseError), so callers
+    can decide whether to retry. Cached replies are returned without calling the model.
+    """
+    cache, key, cached = cache_lookup(user_text, chat_history, summary)
+    if cached is not None:
+        return cached
+
+    response = get_client().complete(
+        messages=build_messages(user_text, chat_history, summary),
+        model=AI_MODEL,
+        temperature=0.7,
+        max_tokens=150,
+        timeout=timeout
+    )
+
+    if response and response.choices and len(response.choices) > 0:
+        reply = response.choices[0].message.content
+        if cache is not None and reply:
+            cache.set(key, reply)
+        return reply
+    raise EmptyResponseError("AI returned empty response")
+
+
+def stream_ai(user_text, chat_history, timeout=AI_TIMEOUT_SECONDS, summary=None):
+    """
+    Streaming variant of complete(): yield the reply text in chunks as the model produces them.
+
+    Raises on failure like complete(); a failure can happen after some chunks were yielded.
+    A cached reply is yielded as a single chunk; a fully streamed reply is added to the cache.
+    """
+    cache, key, cached = cache_lookup(user_text, chat_history, summary)
+    if cached is not None:
+        yield cached
+        return
+
+    response = get_client().complete(
+        messages=build_messages(user_text, chat_history, summary),
+        model=AI_MODEL,
+        temperature=0.7,
+        max_tokens=150,
+        stream=True,
+        timeout=timeout
+    )
+    parts = []
+    try:
+        for update in response:
+            if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+                parts.append(update.choices[0].delta.content)
+                yield update.choices[0].delta.content
+    finally:
+        close = getattr(response, 'close', None)
+        if close:
+            close()
+
+    if cache is not None and parts:
+        cache.set(key, ''.join(parts))
+
+
+def ask_ai(user_text, chat_history):
+    """
+    user_text: the latest user message (string)
+    chat_history: list of ChatMessage objects from DB
+    """
+    try:
+        return complete(user_text, chat_history)
+    except EmptyResponseError:
+        print("AI returned empty response")
+        return FALLBACK_REPLY
     except TimeoutError:
         print("AI API Timeout")
-        return "My response is taking longer than expected. Please try again."
+        return TIMEOUT_REPLY
     except Exception as e:
         print(f"AI API Error: {e}")
         traceback.print_exc()
-        return "I'm having trouble connecting right now. Please try again later."
\ No newline at end of file
+        return FALLBACK_REPLY
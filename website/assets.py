@@ -0,0 +1,213 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import threading
+from flask import Blueprint, request, send_from_directory, url_for
+from markupsafe import Markup, escape
+from .config import env_bool
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Generated files; a deploy step can fill it with `flask build-assets` and a front-end server can serve it
+ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', os.path.join(STATIC_DIR, 'build'))
+# Build missing variants on first use instead of falling back to the original file
+ASSET_ON_DEMAND = env_bool('ASSET_ON_DEMAND', True)
+IMAGE_WIDTHS = (400, 800, 1200)
+# Output format -> (extension, Pillow save options)
+IMAGE_FORMATS = {
+    "webp": ('.webp', {"quality": 75, "method": 6}),
+    "jpeg": ('.jpg', {"quality": 78, "optimize": True, "progressive": True}),
+}
+# Types worth a gzip copy; images are already compressed
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+assets = Blueprint('assets', __name__)
+
+
+class AssetManifest:
+    """
+    Source image name -> its generated variants, kept in manifest.json next to them.
+
+    Variant filenames carry a hash of their content, so they never change once
+    written and can be cached forever; a changed source gets new names.
+    """
+
+    def __init__(self, build_dir=ASSET_BUILD_DIR):
+        self.build_dir = build_dir
+        self.path = os.path.join(build_dir, 'manifest.json')
+        self.entries = None
+        self.lock = threading.Lock()
+        self.failed = set()
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        if self.entries is None:
+            self.entries = self.read()
+        return self.entries
+
+    def get(self, name):
+        with self.lock:
+            return self.load().get(name)
+
+    def set(self, name, entry):
+        # Other workers write the same file: merge into what is on disk now, not into our stale copy
+        with self.lock:
+            self.entries = dict(self.load(), **self.read())
+            self.entries[name] = entry
+            os.makedirs(self.build_dir, exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+
+manifest = AssetManifest()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def write_once(relative_path, data):
+    """Write a content-addressed file unless it is already there."""
+    path = os.path.join(ASSET_BUILD_DIR, relative_path)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    if path.endswith(COMPRESSIBLE):
+        precompress(path)
+
+
+def precompress(path):
+    """Write `path`.gz beside the file when that is actually smaller."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    compressed = gzip.compress(data, 9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + '.gz', 'wb') as f:
+            f.write(compressed)
+
+
+def build_image_variants(name, widths=IMAGE_WIDTHS):
+    """
+    Resize and recompress a static image to each width (never upscaling) in every
+    IMAGE_FORMATS format, and record the hashed filenames in the manifest.
+
+    Requires the optional `Pillow` package. Returns the manifest entry.
+    """
+    from PIL import Image, ImageOps
+
+    source_path = os.path.join(STATIC_DIR, name)
+    with open(source_path, 'rb') as f:
+        source = f.read()
+    entry = manifest.get(name)
+    if entry and entry['source'] == content_hash(source):
+        return entry
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(source))).convert('RGB')
+    stem = os.path.splitext(name)[0]
+    entry = {"source": content_hash(source), "width": image.width, "height": image.height,
+             "variants": {fmt: [] for fmt in IMAGE_FORMATS}}
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt, (extension, options) in IMAGE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), **options)
+            data = buffer.getvalue()
+            filename = f"{stem}-{width}w.{content_hash(data)}{extension}"
+            write_once(filename, data)
+            entry["variants"][fmt].append([width, filename])
+    manifest.set(name, entry)
+    return entry
+
+
+def image_variants(name):
+    """The manifest entry for a static image, building it on demand; None to use the original."""
+    entry = manifest.get(name)
+    if entry is not None or not ASSET_ON_DEMAND or name in manifest.failed:
+        return entry
+    try:
+        return build_image_variants(name)
+    except (ImportError, OSError) as e:
+        # Missing Pillow or source file: serve the original rather than retry on every render
+        print(f"Could not build image variants for '{name}': {e}")
+        manifest.failed.add(name)
+        return None
+
+
+def asset_url(filename):
+    return url_for('assets.serve_asset', filename=filename)
+
+
+def image_url(name, width, fmt='jpeg'):
+    """URL of the smallest variant at least `width` pixels wide (or the largest there is)."""
+    entry = image_variants(name)
+    if entry is None:
+        return url_for('static', filename=name)
+    variants = entry["variants"][fmt]
+    chosen = next((filename for w, filename in variants if w >= width), variants[-1][1])
+    return asset_url(chosen)
+
+
+def image_srcset(name, fmt='jpeg'):
+    entry = image_variants(name)
+    if entry is None:
+        return url_for('static', filename=name)
+    return ', '.join(f"{asset_url(filename)} {w}w" for w, filename in entry["variants"][fmt])
+
+
+def responsive_image(name, alt, width, sizes=None, lazy=True, **attributes):
+    """
+    A <picture> for a static image: WebP variants with JPEG fallbacks, where the
+    browser picks a size from `sizes` (default: `width` CSS pixels) and `src` is the
+    variant for `width`. Extra keyword arguments become <img> attributes.
+    """
+    entry = image_variants(name)
+    attributes = dict(attributes, alt=alt, src=image_url(name, width), decoding='async')
+    if lazy:
+        attributes['loading'] = 'lazy'
+    if entry is None:
+        return Markup('<img{}>').format(html_attributes(attributes))
+    sizes = sizes or f"{width}px"
+    attributes.update(srcset=image_srcset(name), sizes=sizes, width=entry["width"], height=entry["height"])
+    return Markup('<picture><source type="image/webp"{}><img{}></picture>').format(
+        html_attributes({"srcset": image_srcset(name, 'webp'), "sizes": sizes}),
+        html_attributes(attributes),
+    )
+
+
+def html_attributes(attributes):
+    return Markup('').join(Markup(' {}="{}"').format(key, escape(value)) for key, value in attributes.items())
+
+
+@assets.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """
+    Generated assets with far-future immutable caching; safe because every name is
+    content-hashed. A gzip copy is sent to clients that accept it.
+    """
+    gzipped = filename + '.gz'
+    if request.accept_encodings['gzip'] and os.path.exists(os.path.join(ASSET_BUILD_DIR, gzipped)):
+        response = send_from_directory(ASSET_BUILD_DIR, gzipped, max_age=IMMUTABLE_MAX_AGE)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        response = send_from_directory(ASSET_BUILD_DIR, filename, max_age=IMMUTABLE_MAX_AGE)
+    if filename.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
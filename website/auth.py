@@ -1,13 +1,18 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from .models import User
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from .models import User, AccountDeletion
 from website import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import hash_password, verify_password, needs_rehash, HashingBusy
 from flask_login import login_user, login_required, logout_user, current_user
 import re
+from sqlalchemy import case, func, or_
 from sqlalchemy.exc import IntegrityError
+from .identity import invalidate_identity
+from .account_deletion import schedule_account_deletion, job_to_dict
 
 auth = Blueprint('auth', __name__)
 
+BUSY_MESSAGE = 'The server is busy right now. Please try again in a moment.'
+
 def is_valid_email(email):
     pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
     return re.match(pattern, email)
@@ -15,50 +20,107 @@ def is_valid_email(email):
 @auth.route('/sign-up', methods=['GET', 'POST'])
 def sign_up():
     if request.method == 'POST':
-        email = request.form.get('email')
-        username = request.form.get('username')
-        password1 = request.form.get('password1')
-        password2 = request.form.get('password2')
+        email = request.form.get('email') or ''
+        username = request.form.get('username') or ''
+        password1 = request.form.get('password1') or ''
+        password2 = request.form.get('password2') or ''
 
-        user = User.query.filter_by(email=email).first()
-        existing_username = User.query.filter_by(username=username).first()
-        
-        if user:
-            flash('Email already exists.', category='error')
-        elif len(email) < 4:
-            flash('Email must be greater than 3 characters.', category='error')
-        elif not is_valid_email(email):
-            flash('Invalid email format.', category='error')
-        elif existing_username:
-            flash('Username already exists.', category='error')
-        elif len(username) < 2:
-            flash('Username must be greater than 1 character.', category='error')
-        elif password1 != password2:
-            flash('Passwords don\'t match.', category='error')
-        elif len(password1) < 7:
-            flash('Password must be at least 7 characters.', category='error')
+        error = validate_sign_up(email, username, password1, password2) or find_taken_identity(email, username)
+        if error:
+            flash(error, category='error')
         else:
-            new_user = User(email=email, username=username, password=generate_password_hash(password1, method='pbkdf2:sha256'))
             try:
+                new_user = User(email=email, username=username, password=hash_password(password1))
                 db.session.add(new_user)
                 db.session.commit()
                 login_user(new_user, remember=True)
                 flash('Account created!', category='success')
                 return redirect(url_for('views.myaccount'))
-            except IntegrityError:
+            except IntegrityError as e:
+                # Another sign-up took the email or username between the check and the insert
                 db.session.rollback()
-                flash('An error occurred. Please try again.', category='error')
+                flash(unique_violation_message(e), category='error')
+            except HashingBusy:
+                flash(BUSY_MESSAGE, category='error')
 
     return render_template('sign_up.html', user=current_user)
-                    
+
+def validate_sign_up(email, username, password1, password2):
+    """The first problem with the sign-up form that needs no database lookup, or None."""
+    if len(email) < 4:
+        return 'Email must be greater than 3 characters.'
+    if not is_valid_email(email):
+        return 'Invalid email format.'
+    if len(username) < 2:
+        return 'Username must be greater than 1 character.'
+    if password1 != password2:
+        return 'Passwords don\'t match.'
+    if len(password1) < 7:
+        return 'Password must be at least 7 characters.'
+    return None
+
+def find_taken_identity(email, username):
+    """
+    Check email and username against existing users in one indexed query. The database
+    decides which one matched, so its collation applies (case-insensitive on MySQL).
+    """
+    email_taken, username_taken = (
+        db.session.query(
+            func.max(case((User.email == email, 1), else_=0)),
+            func.max(case((User.username == username, 1), else_=0)),
+        )
+        .filter(or_(User.email == email, User.username == username))
+        .one()
+    )
+    if email_taken:
+        return 'Email already exists.'
+    if username_taken:
+        return 'Username already exists.'
+    return None
+
+# Where each driver names the violated key or column; the duplicate value itself is never matched
+UNIQUE_KEY_PATTERNS = (
+    re.compile(r"for key '(?:[^'.]+\.)?([^']+)'"),        # MySQL: Duplicate entry '...' for key 'user.email'
+    re.compile(r"UNIQUE constraint failed: \w+\.(\w+)"),  # SQLite
+    re.compile(r"Key \((\w+)\)="),                        # PostgreSQL
+)
+UNIQUE_FIELD_MESSAGES = {
+    'email': 'Email already exists.',
+    'username': 'Username already exists.',
+}
+
+def unique_violation_message(error):
+    """Map a unique-constraint failure on user to the field whose key or column caused it."""
+    detail = str(error.orig)
+    for pattern in UNIQUE_KEY_PATTERNS:
+        match = pattern.search(detail)
+        if match:
+            key = match.group(1).lower()
+            for field, message in UNIQUE_FIELD_MESSAGES.items():
+                if key == field or key.endswith('_' + field):
+                    return message
+    return 'An error occurred. Please try again.'
+
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
-        user = User.query.filter_by(email=email).first()
+        user = User.query.filter_by(email=email, deleted_at=None).first()
         if user:
-            if check_password_hash(user.password, password):
+            try:
+                password_ok = verify_password(user.password, password)
+            except HashingBusy:
+                flash(BUSY_MESSAGE, category='error')
+                return render_template('myaccount.html', user=current_user)
+            if password_ok and needs_rehash(user.password):
+                try:
+                    user.password = hash_password(password)
+                    db.session.commit()
+                except HashingBusy:
+                    # The upgrade can wait for the next login; the password was correct
+                    pass
+            if password_ok:
                 flash('Logged in successfully!', category='success')
                 login_user(user, remember=True)
                 return redirect(url_for('views.myaccount'))
@@ -82,7 +144,15 @@ def change_password():
         new_password1 = request.form.get('newPassword1')
         new_password2 = request.form.get('newPassword2')
 
-        if not check_password_hash(current_user.password, current_password):
+        user = User.query.get(current_user.id)
+
+        try:
+            password_ok = verify_password(user.password, current_password)
+        except HashingBusy:
+            flash(BUSY_MESSAGE, category='error')
+            return render_template('change_password.html', user=current_user)
+
+        if not password_ok:
             flash('Current password is incorrect.', category='error')
         elif current_password == new_password1:
             flash('New password must be different from the current password.', category='error')
@@ -91,8 +161,13 @@ def change_password():
         elif len(new_password1) < 7:
             flash('New password must be at least 7 characters long.', category='error')
         else:
-            current_user.password = generate_password_hash(new_password1, method='pbkdf2:sha256')
+            try:
+                user.password = hash_password(new_password1)
+            except HashingBusy:
+                flash(BUSY_MESSAGE, category='error')
+                return render_template('change_password.html', user=current_user)
             db.session.commit()
+            invalidate_identity(user.id)
             flash('Password changed successfully!', category='success')
             return redirect(url_for('views.home'))
 
@@ -109,13 +184,10 @@ def delete_account():
                 
                 logout_user()
                 
-                user = User.query.get(user_id)
-                if user:
-                    db.session.delete(user)
-                    db.session.commit()
-                    flash('Your account has been deleted.', category='success')
-                else:
-                    flash('User not found.', category='error')
+                job = schedule_account_deletion(user_id)
+                invalidate_identity(user_id)
+                flash('Your account is being deleted.', category='success')
+                return redirect(url_for('views.home', deletion=job.token))
                     
             except Exception as e:
                 db.session.rollback()
@@ -127,3 +199,8 @@ def delete_account():
             flash('Please type DELETE to confirm.', category='error')
     
     return render_template('delete_account.html', user=current_user)
+
+@auth.route('/account-deletion/<token>')
+def account_deletion_status(token):
+    job = AccountDeletion.query.filter_by(token=token).first_or_404()
+    return jsonify(job_to_dict(job))
@@ -0,0 +1,128 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from website import db
+from .models import ExerciseLibrary
+from .search import term_frequencies
+
+CATALOGUE_TTL_SECONDS = int(os.environ.get('CATALOGUE_TTL_SECONDS', 300))
+
+# Relative weight of a term match in each searchable field
+SEARCH_FIELDS = {"name": 3, "description": 1, "instructions": 1, "benefits": 1}
+
+CatalogueEntry = namedtuple('CatalogueEntry', [c.name for c in ExerciseLibrary.__table__.columns])
+
+_catalogue = None
+_lock = threading.Lock()
+
+
+class Catalogue:
+    """
+    Immutable in-memory snapshot of the exercise library with facet indexes.
+
+    Entries are plain namedtuples, safe to share between requests and threads.
+    Filtering intersects precomputed id sets instead of querying the database.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_id = {entry.id: entry for entry in entries}
+        self.by_difficulty = self.build_facet('difficulty')
+        self.by_type = self.build_facet('exercise_type')
+        self.by_equipment = self.build_facet('requires_equipment', key=bool)
+        self.postings = self.build_postings()
+        self.loaded_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self.expires_at = time.monotonic() + CATALOGUE_TTL_SECONDS
+        digest = hashlib.sha1(repr(entries).encode('utf-8')).hexdigest()
+        self.version = digest[:16]
+
+    def build_facet(self, column, key=lambda value: value):
+        facet = {}
+        for entry in self.entries:
+            facet.setdefault(key(getattr(entry, column)), set()).add(entry.id)
+        return facet
+
+    def build_postings(self):
+        """Inverted index: term -> {entry id: weighted term frequency} over SEARCH_FIELDS."""
+        postings = {}
+        for entry in self.entries:
+            for field, field_weight in SEARCH_FIELDS.items():
+                for term, count in term_frequencies(getattr(entry, field)).items():
+                    weights = postings.setdefault(term, {})
+                    weights[entry.id] = weights.get(entry.id, 0) + count * field_weight
+        return postings
+
+    def search(self, terms):
+        """Entries containing any of `terms`, best tf-idf score first."""
+        total = len(self.entries) or 1
+        scores = {}
+        for term in terms:
+            weights = self.postings.get(term, {})
+            if not weights:
+                continue
+            idf = math.log((total + 1) / (len(weights) + 0.5)) + 0.01
+            for entry_id, weight in weights.items():
+                scores[entry_id] = scores.get(entry_id, 0) + weight * idf
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.by_id[entry_id] for entry_id, _ in ranked]
+
+    def get(self, exercise_id):
+        return self.by_id.get(exercise_id)
+
+    def filter(self, difficulty='', exercise_type='', equipment=''):
+        """Entries matching the exercise page filters, in id order. Empty filters match everything."""
+        selected = None
+        if difficulty:
+            selected = self.by_difficulty.get(difficulty, set())
+        if exercise_type:
+            matches = self.by_type.get(exercise_type, set())
+            selected = matches if selected is None else selected & matches
+        if equipment in ('yes', 'no'):
+            matches = self.by_equipment.get(equipment == 'yes', set())
+            selected = matches if selected is None else selected & matches
+        if selected is None:
+            return list(self.entries)
+        return [entry for entry in self.entries if entry.id in selected]
+
+    def facet_counts(self):
+        return {
+            "difficulty": {value: len(ids) for value, ids in self.by_difficulty.items()},
+            "exercise_type": {value: len(ids) for value, ids in self.by_type.items()},
+            "requires_equipment": {value: len(ids) for value, ids in self.by_equipment.items()},
+        }
+
+    def is_stale(self):
+        return time.monotonic() >= self.expires_at
+
+
+def load_catalogue():
+    columns = ExerciseLibrary.__table__.columns
+    rows = db.session.execute(db.select(*columns).order_by(ExerciseLibrary.id)).all()
+    return Catalogue([CatalogueEntry(*row) for row in rows])
+
+
+def get_catalogue():
+    """
+    The cached catalogue, loading it on first use or after CATALOGUE_TTL_SECONDS.
+
+    Write paths call invalidate_catalogue(); the TTL only bounds how long other
+    worker processes can serve an out-of-date copy.
+    """
+    global _catalogue
+    catalogue = _catalogue
+    if catalogue is None or catalogue.is_stale():
+        with _lock:
+            if _catalogue is None or _catalogue.is_stale():
+                _catalogue = load_catalogue()
+            catalogue = _catalogue
+    return catalogue
+
+
+def invalidate_catalogue():
+    global _catalogue
+    with _lock:
+        _catalogue = None
@@ -0,0 +1,341 @@
+import json
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from website import db
+from .models import ChatMessage, ChatSummary
+from . import ai_agent
+
+AI_MAX_WORKERS = int(os.environ.get('AI_MAX_WORKERS', 4))
+AI_MAX_PENDING = int(os.environ.get('AI_MAX_PENDING', 32))
+# Streamed replies hold a request thread each for the whole model call
+AI_MAX_STREAMS = int(os.environ.get('AI_MAX_STREAMS', 8))
+AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 2))
+AI_RETRY_BACKOFF_SECONDS = float(os.environ.get('AI_RETRY_BACKOFF_SECONDS', 0.5))
+# Newest messages fetched per reply; ai_agent then packs them into its token budget
+HISTORY_LIMIT = int(os.environ.get('AI_HISTORY_LIMIT', 20))
+# Opt-in rolling summary of the turns older than HISTORY_LIMIT
+AI_CONTEXT_SUMMARY = os.environ.get('AI_CONTEXT_SUMMARY') == '1'
+SUMMARY_MIN_MESSAGES = 6
+SUMMARY_BATCH_SIZE = 40
+MAX_MESSAGE_LENGTH = 500
+CHAT_PAGE_SIZE = 30
+MAX_CHAT_PAGE_SIZE = 100
+
+BUSY_REPLY = "Lots of people are chatting right now. Please try again in a moment."
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(AI_MAX_PENDING)
+stream_slots = threading.BoundedSemaphore(AI_MAX_STREAMS)
+
+# Recent time-to-first-token samples (milliseconds) of streamed replies
+ttft_samples = deque(maxlen=1000)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def ttft_summary():
+    """Count, median and 95th percentile of the recent time-to-first-token samples, in milliseconds."""
+    samples = sorted(ttft_samples.copy())
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None}
+    return {"count": len(samples), "p50_ms": round(percentile(samples, 0.5), 1),
+            "p95_ms": round(percentile(samples, 0.95), 1)}
+
+
+def validate_chat_message(text):
+    """Return an error message for an unacceptable chat message, or None if it is fine."""
+    if not text or len(text.strip()) == 0:
+        return 'Message cannot be empty.'
+    if len(text) > MAX_MESSAGE_LENGTH:
+        return f'Message too long. Max {MAX_MESSAGE_LENGTH} characters.'
+    return None
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=AI_MAX_WORKERS, thread_name_prefix='ai-chat')
+    return _executor
+
+
+def submit_reply(message):
+    """
+    Queue the bot reply to a pending user ChatMessage and return immediately.
+
+    At most AI_MAX_WORKERS model calls run at once and at most AI_MAX_PENDING replies
+    may be queued or running; beyond that the user gets a "busy" reply straight away
+    instead of piling up work. Set AI_CHAT_INLINE in the app config to run the job
+    synchronously (useful in tests). Returns False if the message was turned away.
+    """
+    app = current_app._get_current_object()
+    if app.config.get('AI_CHAT_INLINE'):
+        run_reply_job(app, message.id)
+        return True
+
+    if not _slots.acquire(blocking=False):
+        save_reply(message, BUSY_REPLY, 'failed')
+        return False
+
+    future = get_executor().submit(run_reply_job, app, message.id)
+    future.add_done_callback(lambda _: _slots.release())
+    return True
+
+
+def run_reply_job(app, message_id):
+    with app.app_context():
+        try:
+            message = ChatMessage.query.get(message_id)
+            if message is None or message.status != 'pending':
+                return
+            text, history, summary = load_context(message)
+            try:
+                reply = complete_with_retries(text, history, summary)
+                status = 'answered'
+            except TimeoutError:
+                print("AI API Timeout")
+                reply, status = ai_agent.TIMEOUT_REPLY, 'failed'
+            except Exception as e:
+                print(f"AI API Error: {e}")
+                traceback.print_exc()
+                reply, status = ai_agent.FALLBACK_REPLY, 'failed'
+            # Reloaded: the model call can take a while and the message may be gone by now
+            message = ChatMessage.query.get(message_id)
+            if message is None:
+                return
+            save_reply(message, reply, status)
+            schedule_summary(app, message.user_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Chat reply job failed: {e}")
+            traceback.print_exc()
+        finally:
+            db.session.remove()
+
+
+def complete_with_retries(user_text, history, summary=None, retries=AI_MAX_RETRIES, backoff=AI_RETRY_BACKOFF_SECONDS):
+    attempt = 0
+    while True:
+        try:
+            return ai_agent.complete(user_text, history, summary=summary)
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            attempt += 1
+            print(f"AI call failed ({e}), retrying ({attempt}/{retries})")
+            time.sleep(backoff * (2 ** (attempt - 1)))
+
+
+def load_history(message, limit=HISTORY_LIMIT):
+    """The `limit` messages before `message` in its conversation, oldest first."""
+    history = (
+        ChatMessage.query
+        .filter(ChatMessage.user_id == message.user_id, ChatMessage.id < message.id)
+        .order_by(ChatMessage.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return history[::-1]
+
+
+def load_context(message):
+    """
+    The question, its history and the conversation summary for a reply to `message`.
+
+    Ends the read transaction before returning, so no connection is held while the
+    model answers; the history comes back detached and `message` reloads on next use.
+    """
+    history = load_history(message)
+    summary = load_summary(message.user_id)
+    text = message.message
+    for past in history:
+        db.session.expunge(past)
+    db.session.commit()
+    return text, history, summary
+
+
+def load_summary(user_id):
+    if not AI_CONTEXT_SUMMARY:
+        return None
+    row = db.session.query(ChatSummary.summary).filter_by(user_id=user_id).first()
+    return row[0] if row else None
+
+
+def schedule_summary(app, user_id):
+    if AI_CONTEXT_SUMMARY:
+        get_executor().submit(run_summary_job, app, user_id)
+
+
+def run_summary_job(app, user_id):
+    with app.app_context():
+        try:
+            update_summary(user_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Chat summary job failed: {e}")
+        finally:
+            db.session.remove()
+
+
+def update_summary(user_id, window=HISTORY_LIMIT, batch_size=SUMMARY_BATCH_SIZE):
+    """
+    Fold messages that have scrolled out of the recent window into the user's rolling summary.
+
+    Waits until at least SUMMARY_MIN_MESSAGES are uncovered and summarizes at most
+    `batch_size` of them per call, so each run costs one bounded model call.
+    Returns True if the summary changed.
+    """
+    window_start = (
+        db.session.query(ChatMessage.id)
+        .filter(ChatMessage.user_id == user_id)
+        .order_by(ChatMessage.id.desc())
+        .offset(window - 1)
+        .limit(1)
+        .scalar()
+    )
+    if window_start is None:
+        return False
+
+    summary = ChatSummary.query.filter_by(user_id=user_id).first()
+    covered = summary.last_message_id if summary else 0
+    older = (
+        ChatMessage.query
+        .filter(ChatMessage.user_id == user_id, ChatMessage.id > covered, ChatMessage.id < window_start)
+        .order_by(ChatMessage.id)
+        .limit(batch_size)
+        .all()
+    )
+    if len(older) < SUMMARY_MIN_MESSAGES:
+        return False
+
+    text = ai_agent.summarize(summary.summary if summary else None, older)
+    if summary is None:
+        summary = ChatSummary(user_id=user_id)
+        db.session.add(summary)
+    summary.summary = text
+    summary.last_message_id = older[-1].id
+    db.session.commit()
+    return True
+
+
+def save_reply(message, reply, status):
+    bot_message = ChatMessage(user_id=message.user_id, message=reply, sender='bot')
+    db.session.add(bot_message)
+    message.status = status
+    db.session.commit()
+    return bot_message
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_reply(message, slots=stream_slots):
+    """
+    reply_events() in one of the process's stream slots. When none is free the user
+    gets BUSY_REPLY as a single 'busy' event instead of a request thread waiting on
+    the model. The slot is taken on the first read and given back when the response is closed.
+    """
+    if not slots.acquire(blocking=False):
+        bot_message = save_reply(message, BUSY_REPLY, 'failed')
+        yield sse_event('busy', {"id": bot_message.id, "text": BUSY_REPLY})
+        return
+    try:
+        yield from reply_events(message)
+    finally:
+        slots.release()
+
+
+def reply_events(message):
+    """
+    Generate the bot reply to a pending user message as server-sent events.
+
+    Emits a 'token' event per chunk from the model and a final 'done' event with the
+    saved reply's id and timings. The full text is written to ChatMessage once the
+    stream ends, including when the client disconnects part-way through. No database
+    transaction is held open while the model streams.
+    """
+    started = time.perf_counter()
+    first_token_ms = None
+    parts = []
+    status = 'answered'
+    try:
+        try:
+            text, history, summary = load_context(message)
+            for token in ai_agent.stream_ai(text, history, summary=summary):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                    ttft_samples.append(first_token_ms)
+                parts.append(token)
+                yield sse_event('token', {"text": token})
+        except Exception as e:
+            print(f"AI stream error: {e}")
+            status = 'failed'
+            if not parts:
+                fallback = ai_agent.TIMEOUT_REPLY if isinstance(e, TimeoutError) else ai_agent.FALLBACK_REPLY
+                parts.append(fallback)
+                yield sse_event('token', {"text": fallback})
+    except GeneratorExit:
+        save_reply(message, ''.join(parts) or ai_agent.FALLBACK_REPLY, 'failed')
+        raise
+
+    bot_message = save_reply(message, ''.join(parts), status)
+    schedule_summary(current_app._get_current_object(), message.user_id)
+    total_ms = (time.perf_counter() - started) * 1000
+    yield sse_event('done', {
+        "id": bot_message.id,
+        "status": status,
+        "ttft_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+        "total_ms": round(total_ms, 1),
+    })
+
+
+def get_messages_after(user_id, after_id=0, limit=50):
+    """New messages in a user's conversation plus whether a reply is still being generated."""
+    messages = (
+        ChatMessage.query
+        .filter(ChatMessage.user_id == user_id, ChatMessage.id > after_id)
+        .order_by(ChatMessage.id)
+        .limit(limit)
+        .all()
+    )
+    pending = db.session.query(
+        ChatMessage.query.filter_by(user_id=user_id, status='pending').exists()
+    ).scalar()
+    return messages, pending
+
+
+def get_messages_before(user_id, before_id=None, limit=CHAT_PAGE_SIZE):
+    """
+    One page of a user's conversation ending just before `before_id` (the latest page if None).
+
+    A keyset query on the (user_id, id) index, newest first, so it reads `limit` rows
+    however long the history is. Returns (messages oldest first, next_before_id);
+    next_before_id is None once the start of the conversation is reached.
+    """
+    query = ChatMessage.query.filter(ChatMessage.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(ChatMessage.id < before_id)
+    messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+    return messages, messages[0].id if has_more else None
+
+
+def message_to_dict(message):
+    return {
+        "id": message.id,
+        "sender": message.sender,
+        "message": message.message,
+        "status": message.status,
+        "date": message.date.isoformat() if message.date else None,
+    }
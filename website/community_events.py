@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from .config import env_int
+
+# Server processes sharing the app; gunicorn.conf.py exports it for its workers
+WEB_CONCURRENCY = env_int('WEB_CONCURRENCY', 1)
+# 'memory' fans out within one process; 'redis' shares events between all workers and is the
+# default as soon as there is more than one
+COMMUNITY_EVENTS_BACKEND = os.environ.get('COMMUNITY_EVENTS_BACKEND') or ('redis' if WEB_CONCURRENCY > 1 else 'memory')
+COMMUNITY_EVENTS_REDIS_URL = os.environ.get('COMMUNITY_EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+# Recent events kept so a reconnecting client can catch up from its Last-Event-ID
+COMMUNITY_EVENT_BACKLOG = int(os.environ.get('COMMUNITY_EVENT_BACKLOG', 500))
+# A stream is closed after this long and the browser reconnects, so no thread is held forever
+COMMUNITY_STREAM_SECONDS = int(os.environ.get('COMMUNITY_STREAM_SECONDS', 60))
+# Open streams per process; each holds a request thread, so keep this well below the thread count
+COMMUNITY_MAX_STREAMS = env_int('COMMUNITY_MAX_STREAMS', 8)
+# How long a client turned away because all stream slots are busy waits before trying again
+BUSY_RETRY_MS = 30000
+HEARTBEAT_SECONDS = 15
+
+stream_slots = threading.BoundedSemaphore(COMMUNITY_MAX_STREAMS)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class MemoryBroker:
+    """In-process event fan-out: a bounded backlog plus a condition that wakes waiting streams."""
+
+    def __init__(self, backlog=COMMUNITY_EVENT_BACKLOG):
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.condition = threading.Condition()
+
+    def publish(self, event, data):
+        with self.condition:
+            self.last_id += 1
+            self.events.append((str(self.last_id), event, data))
+            self.condition.notify_all()
+            return str(self.last_id)
+
+    def latest_id(self):
+        return str(self.last_id)
+
+    def ping(self):
+        return True
+
+    def read(self, after_id, timeout):
+        """
+        Events after `after_id`, waiting up to `timeout` seconds for one to arrive.
+
+        Returns (events, missed); missed is True when `after_id` has already fallen
+        out of the backlog, so the reader can't be brought up to date.
+        """
+        try:
+            after = int(after_id)
+        except (TypeError, ValueError):
+            after = self.last_id
+        with self.condition:
+            if self.last_id <= after:
+                self.condition.wait(timeout)
+            missed = bool(self.events) and after < int(self.events[0][0]) - 1
+            return [entry for entry in self.events if int(entry[0]) > after], missed
+
+
+class RedisBroker:
+    """
+    Event fan-out through a capped Redis stream, shared by every worker process.
+
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url=COMMUNITY_EVENTS_REDIS_URL, backlog=COMMUNITY_EVENT_BACKLOG, key='community-events'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.backlog = backlog
+        self.key = key
+
+    def publish(self, event, data):
+        fields = {"event": event, "data": json.dumps(data)}
+        return self.client.xadd(self.key, fields, maxlen=self.backlog, approximate=True).decode('utf-8')
+
+    def ping(self):
+        return self.client.ping()
+
+    def latest_id(self):
+        latest = self.client.xrevrange(self.key, count=1)
+        return latest[0][0].decode('utf-8') if latest else '0-0'
+
+    def read(self, after_id, timeout):
+        after_id = after_id or self.latest_id()
+        response = self.client.xread({self.key: after_id}, block=int(timeout * 1000), count=100)
+        events = []
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                events.append((entry_id.decode('utf-8'), fields[b'event'].decode('utf-8'),
+                               json.loads(fields[b'data'])))
+        return events, False
+
+
+def check_backend(backend=None, workers=None):
+    """
+    Refuse the in-process broker when several worker processes serve the app: each
+    would only see its own events and event ids, so live updates would go missing.
+    """
+    backend = backend or COMMUNITY_EVENTS_BACKEND
+    workers = WEB_CONCURRENCY if workers is None else workers
+    if backend == 'memory' and workers > 1:
+        raise RuntimeError(
+            f"COMMUNITY_EVENTS_BACKEND=memory only works with one worker process, not {workers}; "
+            "use COMMUNITY_EVENTS_BACKEND=redis"
+        )
+
+
+def check_broker():
+    """
+    Connect to the configured broker once at startup, so a missing `redis` package or an
+    unreachable server stops the app from starting instead of failing community pages.
+    """
+    try:
+        get_broker().ping()
+    except Exception as e:
+        raise RuntimeError(f"Community event broker '{COMMUNITY_EVENTS_BACKEND}' is unavailable: {e!r}") from e
+
+
+def get_broker():
+    """The broker selected by COMMUNITY_EVENTS_BACKEND ('memory' or 'redis')."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = RedisBroker() if COMMUNITY_EVENTS_BACKEND == 'redis' else MemoryBroker()
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the broker, e.g. for a fresh MemoryBroker in tests."""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+def publish(event, data):
+    """Broadcast a community change after it is committed. A broker failure never fails the request."""
+    try:
+        return get_broker().publish(event, data)
+    except Exception as e:
+        print(f"Could not publish community event '{event}': {e}")
+        return None
+
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def limited_event_stream(broker, after_id, slots=stream_slots):
+    """
+    event_stream() in one of the process's stream slots. When none is free the client
+    is only told to retry in BUSY_RETRY_MS, leaving the request threads to normal pages.
+    The slot is taken on the first read and given back when the response is closed.
+    """
+    if not slots.acquire(blocking=False):
+        yield f"retry: {BUSY_RETRY_MS}\n\n"
+        return
+    try:
+        yield from event_stream(broker, after_id)
+    finally:
+        slots.release()
+
+
+def event_stream(broker, after_id, duration=COMMUNITY_STREAM_SECONDS):
+    """
+    Server-sent events for every community change after `after_id`.
+
+    Holds no database connection while it waits. A comment line goes out every
+    HEARTBEAT_SECONDS to keep proxies from closing an idle stream, and the stream
+    ends after `duration` seconds; EventSource then reconnects with Last-Event-ID.
+    """
+    deadline = time.monotonic() + duration
+    last_id = after_id or broker.latest_id()
+    yield "retry: 3000\n\n"
+    while time.monotonic() < deadline:
+        events, missed = broker.read(last_id, HEARTBEAT_SECONDS)
+        if missed:
+            yield format_event(broker.latest_id(), 'reset', {})
+            return
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        for event_id, event, data in events:
+            last_id = event_id
+            yield format_event(event_id, event, data)
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from sqlalchemy.pool import QueuePool
+
+DB_USER = os.environ.get('DB_USER', "root")
+DB_PASSWORD = os.environ.get('DB_PASSWORD', "Czechoslovakia")
+DB_HOST = os.environ.get('DB_HOST', "localhost")
+DB_PORT = int(os.environ.get('DB_PORT', 3306))
+DB_NAME = os.environ.get('DB_NAME', "fitness_tracker")
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name, default):
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_uri():
+    """DATABASE_URL if set (e.g. 'sqlite://' for an in-memory database), else the MySQL server from DB_*."""
+    return os.environ.get('DATABASE_URL') or (
+        f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+    )
+
+
+def engine_options(uri):
+    """
+    SQLAlchemy engine options for `uri`, tunable through the environment.
+
+    Server databases get a QueuePool sized by DB_POOL_SIZE/DB_MAX_OVERFLOW that waits
+    at most DB_POOL_TIMEOUT seconds for a free connection, recycles connections after
+    DB_POOL_RECYCLE seconds (keep it below MySQL's wait_timeout) and pings them on
+    checkout (DB_POOL_PRE_PING) so idle-timeout disconnects never reach a request.
+    SQLite keeps Flask-SQLAlchemy's defaults, which share one connection for in-memory
+    databases.
+    """
+    if uri.startswith('sqlite'):
+        return {}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': env_int('DB_POOL_SIZE', 10),
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 280),
+        'pool_pre_ping': env_bool('DB_POOL_PRE_PING', True),
+    }
+    if uri.startswith('mysql+pymysql'):
+        options['connect_args'] = {
+            'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 10),
+            'read_timeout': env_int('DB_READ_TIMEOUT', 30),
+            'write_timeout': env_int('DB_WRITE_TIMEOUT', 30),
+        }
+    return options
+
+
+class PoolMetrics:
+    """Counters for connection checkouts, including how long requests waited for a connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_seconds_total": round(self.wait_seconds_total, 6),
+                "checkout_wait_seconds_max": round(self.wait_seconds_max, 6),
+                "checkout_wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout, so pool exhaustion shows up as wait time."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def pool_status(engine):
+    """Current pool occupancy for `engine` plus the checkout metrics."""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout(),
+        })
+    status.update(pool_metrics.snapshot())
+    return status
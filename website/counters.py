@@ -0,0 +1,127 @@
+from sqlalchemy import func
+from website import db
+from .models import Post, Comment, Like
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def insert_ignore(table):
+    """INSERT that silently skips rows violating a unique index, so concurrent inserts can't fail."""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        return table.insert().prefix_with('IGNORE')
+    if dialect == 'sqlite':
+        return table.insert().prefix_with('OR IGNORE')
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing()
+    raise NotImplementedError(f"insert_ignore is not supported for '{dialect}'")
+
+
+def set_like(user_id, post_id, liked):
+    """
+    Idempotently like or unlike a post and keep Post.likes_count in step.
+
+    The unique (user_id, post_id) index decides which of two concurrent requests
+    actually changes anything; the counter is only moved by the one whose INSERT
+    or DELETE touched a row, using an in-database increment. Returns the new count.
+    """
+    if liked:
+        result = db.session.execute(insert_ignore(Like.__table__).values(user_id=user_id, post_id=post_id))
+        delta = result.rowcount
+    else:
+        delta = -Like.query.filter_by(user_id=user_id, post_id=post_id).delete(synchronize_session=False)
+
+    if delta:
+        Post.query.filter_by(id=post_id).update(
+            {Post.likes_count: Post.likes_count + delta}, synchronize_session=False
+        )
+    db.session.commit()
+    return db.session.query(Post.likes_count).filter_by(id=post_id).scalar()
+
+
+def toggle_like(user_id, post_id):
+    """Flip the user's like on a post. Returns (liked, like_count)."""
+    already_liked = db.session.query(
+        Like.query.filter_by(user_id=user_id, post_id=post_id).exists()
+    ).scalar()
+    liked = not already_liked
+    return liked, set_like(user_id, post_id, liked)
+
+
+def bump_comment_count(post_id, delta):
+    Post.query.filter_by(id=post_id).update(
+        {Post.comments_count: Post.comments_count + delta}, synchronize_session=False
+    )
+
+
+def get_comment_count(post_id):
+    return db.session.query(Post.comments_count).filter_by(id=post_id).scalar() or 0
+
+
+def dedupe_likes():
+    """Delete duplicate (user_id, post_id) likes left over from before the unique index existed."""
+    keep = (
+        db.session.query(func.min(Like.id))
+        .group_by(Like.user_id, Like.post_id)
+        .subquery()
+    )
+    removed = (
+        Like.query
+        .filter(Like.id.notin_(db.session.query(keep.c[0])))
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return removed
+
+
+def reconcile_post_counters(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Recompute Post.likes_count and Post.comments_count from the Like and Comment tables.
+
+    Works through posts in id ranges of `batch_size` with one grouped COUNT per table
+    and a bulk UPDATE per batch, committing between batches to keep transactions short.
+    Returns the number of posts whose counters were corrected.
+    """
+    dedupe_likes()
+
+    fixed = 0
+    last_id = 0
+    while True:
+        posts = (
+            db.session.query(Post.id, Post.likes_count, Post.comments_count)
+            .filter(Post.id > last_id)
+            .order_by(Post.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not posts:
+            break
+        first_id, last_id = posts[0].id, posts[-1].id
+
+        like_counts = dict(
+            db.session.query(Like.post_id, func.count(Like.id))
+            .filter(Like.post_id.between(first_id, last_id))
+            .group_by(Like.post_id)
+            .all()
+        )
+        comment_counts = dict(
+            db.session.query(Comment.post_id, func.count(Comment.id))
+            .filter(Comment.post_id.between(first_id, last_id))
+            .group_by(Comment.post_id)
+            .all()
+        )
+
+        updates = []
+        for post in posts:
+            likes = like_counts.get(post.id, 0)
+            comments = comment_counts.get(post.id, 0)
+            if post.likes_count != likes or post.comments_count != comments:
+                updates.append({"id": post.id, "likes_count": likes, "comments_count": comments})
+
+        if updates:
+            db.session.bulk_update_mappings(Post, updates)
+            fixed += len(updates)
+        db.session.commit()
+
+    return fixed
@@ -0,0 +1,197 @@
+import csv
+import json
+from datetime import datetime, timezone, timedelta
+from website import db
+from .models import Exercise, local_now
+from .stats import upsert_daily_activity_rows
+
+MAX_BATCH_SIZE = 500
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+MAX_DURATION_MINUTES = 24 * 60
+MAX_CALORIES = 20000
+
+
+class SessionError(ValueError):
+    """A logged session that can't be stored, with a message safe to show the user."""
+
+
+def parse_int(value, field, maximum):
+    if value in (None, ''):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise SessionError(f"{field} must be a whole number")
+    if number < 0 or number > maximum:
+        raise SessionError(f"{field} must be between 0 and {maximum}")
+    return number
+
+
+def parse_completed_at(value, now):
+    """ISO 8601 date or datetime in the app's local time; values with an offset are converted to it."""
+    if value in (None, ''):
+        return now
+    try:
+        completed = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise SessionError("date_completed must be an ISO 8601 date or datetime")
+    if completed.tzinfo is not None:
+        # Same UTC+1 wall clock that local_now() stores
+        completed = (completed.astimezone(timezone.utc) + timedelta(hours=1)).replace(tzinfo=None)
+    if completed.date() > now.date():
+        raise SessionError("date_completed is after today")
+    return completed
+
+
+def build_exercise_row(user_id, item, catalogue, names, now):
+    """
+    Turn one submitted session into an Exercise row, using the library entry for defaults.
+
+    The entry is found by exercise_id, or by exercise_name for exports that don't know
+    our ids. A custom duration without calories scales the library's calories to match.
+    """
+    if not isinstance(item, dict):
+        raise SessionError("each session must be an object")
+    entry = None
+    exercise_id = item.get('exercise_id')
+    if exercise_id not in (None, ''):
+        try:
+            entry = catalogue.get(int(exercise_id))
+        except (TypeError, ValueError):
+            raise SessionError("exercise_id must be a whole number")
+    elif item.get('exercise_name'):
+        entry = names.get(str(item['exercise_name']).strip().lower())
+    if entry is None:
+        raise SessionError("unknown exercise")
+
+    duration = parse_int(item.get('duration_minutes'), 'duration_minutes', MAX_DURATION_MINUTES)
+    calories = parse_int(item.get('calories_burned'), 'calories_burned', MAX_CALORIES)
+    if duration is None:
+        duration = entry.duration_minutes
+    if calories is None:
+        calories = entry.calories_burned
+        if duration != entry.duration_minutes and entry.duration_minutes and entry.calories_burned:
+            calories = round(entry.calories_burned * duration / entry.duration_minutes)
+
+    return {
+        "user_id": user_id,
+        "title": entry.name,
+        "exercise_type": entry.exercise_type,
+        "duration_minutes": duration,
+        "calories_burned": calories,
+        "date_completed": parse_completed_at(item.get('date_completed'), now),
+    }
+
+
+def library_names(catalogue):
+    return {entry.name.lower(): entry for entry in catalogue.entries}
+
+
+def log_sessions(user_id, items, catalogue):
+    """
+    Validate and store a batch of completed sessions in a single transaction.
+
+    Library references are resolved against the cached catalogue, the Exercise rows
+    go in as one executemany INSERT and the daily rollup is updated with one multi-row
+    upsert. Either every session is stored or, if any is invalid, none are: raises
+    SessionError naming the first bad item.
+    """
+    names = library_names(catalogue)
+    now = local_now().replace(tzinfo=None)
+    rows = []
+    for index, item in enumerate(items):
+        try:
+            rows.append(build_exercise_row(user_id, item, catalogue, names, now))
+        except SessionError as e:
+            raise SessionError(f"session {index}: {e}")
+    insert_sessions(rows)
+    db.session.commit()
+    return len(rows)
+
+
+def insert_sessions(rows):
+    """INSERT the Exercise rows in one statement and fold them into the daily rollup. Doesn't commit."""
+    if not rows:
+        return
+    db.session.execute(Exercise.__table__.insert(), rows)
+    days = {}
+    for row in rows:
+        key = (row["user_id"], row["date_completed"].date())
+        totals = days.setdefault(key, {"user_id": key[0], "day": key[1], "sessions": 0, "minutes": 0, "calories": 0})
+        totals["sessions"] += 1
+        totals["minutes"] += row["duration_minutes"] or 0
+        totals["calories"] += row["calories_burned"] or 0
+    upsert_daily_activity_rows(list(days.values()))
+
+
+def read_records(lines, fmt):
+    """Yield one dict per record from an iterable of text lines in 'csv' or 'jsonl' format."""
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def decode_lines(stream):
+    for raw in stream:
+        yield raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+
+
+def import_sessions(user_id, stream, fmt, catalogue, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import a CSV or JSON-lines history file for a user, streaming it in fixed-size chunks.
+
+    The file is never held in memory: each chunk of valid rows is inserted and
+    committed before the next is read. Invalid rows are skipped and reported
+    (up to MAX_REPORTED_ERRORS) by their 1-based record number.
+    """
+    names = library_names(catalogue)
+    now = local_now().replace(tzinfo=None)
+    imported = 0
+    skipped = 0
+    errors = []
+    chunk = []
+
+    for number, record in enumerate(read_records(decode_lines(stream), fmt), start=1):
+        try:
+            if record is None:
+                raise SessionError("not valid JSON")
+            chunk.append(build_exercise_row(user_id, record, catalogue, names, now))
+        except SessionError as e:
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"record": number, "error": str(e)})
+        if len(chunk) >= chunk_size:
+            insert_sessions(chunk)
+            db.session.commit()
+            imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        insert_sessions(chunk)
+        db.session.commit()
+        imported += len(chunk)
+    return {"imported": imported, "skipped": skipped, "errors": errors}
+
+
+def import_format(content_type, filename=None):
+    """'csv' or 'jsonl' from an explicit upload name or Content-Type, else None."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines', 'application/jsonlines'):
+        return 'jsonl'
+    return None
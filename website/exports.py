@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from website import db
+from .models import Exercise, Post, Comment, ChatMessage
+
+EXPORT_BATCH_SIZE = 1000
+# Compressed output is held back until at least this much is ready, so chunks aren't tiny
+MIN_CHUNK_BYTES = 16 * 1024
+
+# Export name -> (model, exported columns)
+EXPORTS = {
+    "exercises": (Exercise, (Exercise.id, Exercise.title, Exercise.exercise_type, Exercise.duration_minutes,
+                             Exercise.calories_burned, Exercise.date_completed)),
+    "posts": (Post, (Post.id, Post.content, Post.date, Post.likes_count, Post.comments_count)),
+    "comments": (Comment, (Comment.id, Comment.post_id, Comment.content, Comment.date)),
+    "chat": (ChatMessage, (ChatMessage.id, ChatMessage.sender, ChatMessage.message, ChatMessage.status,
+                           ChatMessage.date)),
+}
+
+
+def export_rows(kind, user_id, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield lists of up to `batch_size` rows of one of the user's exports, oldest first.
+
+    yield_per streams the result through a server-side cursor (SSCursor on MySQL),
+    so only one batch is ever held in memory however long the history is.
+    """
+    model, columns = EXPORTS[kind]
+    query = (
+        db.session.query(*columns)
+        .filter(model.user_id == user_id)
+        .order_by(model.id)
+        .yield_per(batch_size)
+    )
+    batch = []
+    for row in query:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def plain_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_batches(kind, batches, fmt):
+    """Text chunks of CSV (with a header row) or JSON lines, one chunk per batch."""
+    names = [column.key for column in EXPORTS[kind][1]]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for batch in batches:
+            writer.writerows([plain_value(value) for value in row] for row in batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+    for batch in batches:
+        yield ''.join(
+            json.dumps({name: plain_value(value) for name, value in zip(names, row)}) + '\n'
+            for row in batch
+        )
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks on the fly, yielding compressed bytes as they fill up."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        if pending_size >= MIN_CHUNK_BYTES:
+            yield b''.join(pending)
+            pending = []
+            pending_size = 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
+
+
+def stream_export(kind, user_id, fmt, compress=True):
+    """Byte chunks of the complete export, gzip-compressed unless `compress` is False."""
+    chunks = encode_batches(kind, export_rows(kind, user_id), fmt)
+    if compress:
+        return gzip_chunks(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
@@ -0,0 +1,180 @@
+from datetime import datetime
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import contains_eager
+from website import db
+from .models import User, Post, Comment, Like
+
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+COMMENT_PREVIEW_LIMIT = 3
+
+
+class FeedItem:
+    """One rendered post in the community feed with everything the template needs preloaded."""
+
+    def __init__(self, post, like_count=0, liked=False, comment_count=0, comments=None):
+        self.post = post
+        self.like_count = like_count
+        self.liked = liked
+        self.comment_count = comment_count
+        self.comments = comments or []
+
+    def to_dict(self):
+        return {
+            "id": self.post.id,
+            "user_id": self.post.user_id,
+            "username": self.post.user.username,
+            "content": self.post.content,
+            "date": self.post.date.isoformat() if self.post.date else None,
+            "like_count": self.like_count,
+            "liked": self.liked,
+            "comment_count": self.comment_count,
+            "comments": [comment_to_dict(c) for c in self.comments],
+        }
+
+
+def comment_to_dict(comment):
+    return {
+        "id": comment.id,
+        "post_id": comment.post_id,
+        "user_id": comment.user_id,
+        "username": comment.user.username,
+        "content": comment.content,
+        "date": comment.date.isoformat() if comment.date else None,
+    }
+
+
+def encode_cursor(post):
+    return f"{post.date.isoformat()}_{post.id}"
+
+
+def decode_cursor(cursor):
+    """Turn a 'date_id' cursor back into a (datetime, id) pair, or None if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        date_part, id_part = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except ValueError:
+        return None
+
+
+def clamp_limit(limit, default=FEED_PAGE_SIZE, maximum=MAX_FEED_PAGE_SIZE):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def get_feed_page(viewer=None, cursor=None, limit=FEED_PAGE_SIZE):
+    """
+    Load one page of the community feed, newest first, keyset-paginated on (Post.date, Post.id).
+
+    Runs a fixed number of queries regardless of page size or feed length:
+    posts + authors (with their denormalized counters), the viewer's likes
+    and comment previews.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    query = (
+        Post.query
+        .join(Post.user)
+        .options(contains_eager(Post.user))
+        .filter(User.deleted_at.is_(None))
+        .order_by(Post.date.desc(), Post.id.desc())
+    )
+
+    position = decode_cursor(cursor)
+    if position:
+        before_date, before_id = position
+        query = query.filter(or_(
+            Post.date < before_date,
+            and_(Post.date == before_date, Post.id < before_id),
+        ))
+
+    posts = query.limit(limit + 1).all()
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    if not posts:
+        return [], None
+
+    post_ids = [post.id for post in posts]
+    liked_ids = load_liked_post_ids(viewer, post_ids)
+    previews = load_comment_previews(post_ids)
+
+    items = [
+        FeedItem(
+            post,
+            like_count=post.likes_count,
+            liked=post.id in liked_ids,
+            comment_count=post.comments_count,
+            comments=previews.get(post.id, []),
+        )
+        for post in posts
+    ]
+    next_cursor = encode_cursor(posts[-1]) if has_more else None
+    return items, next_cursor
+
+
+def load_liked_post_ids(viewer, post_ids):
+    if viewer is None or not viewer.is_authenticated:
+        return set()
+    rows = (
+        db.session.query(Like.post_id)
+        .filter(Like.user_id == viewer.id, Like.post_id.in_(post_ids))
+        .all()
+    )
+    return {row[0] for row in rows}
+
+
+def load_comment_previews(post_ids, per_post=COMMENT_PREVIEW_LIMIT):
+    """
+    Fetch the newest `per_post` comments of every post, with authors, in a single query.
+
+    A window function ranks comments within each post so every post's preview comes
+    from the same round-trip. Previews are returned oldest-first so they read like
+    a conversation.
+    """
+    ranked = (
+        db.session.query(
+            Comment.id.label('id'),
+            func.row_number().over(
+                partition_by=Comment.post_id,
+                order_by=(Comment.date.desc(), Comment.id.desc()),
+            ).label('rank'),
+        )
+        .filter(Comment.post_id.in_(post_ids))
+        .subquery()
+    )
+    rows = (
+        Comment.query
+        .join(ranked, ranked.c.id == Comment.id)
+        .join(Comment.user)
+        .options(contains_eager(Comment.user))
+        .filter(ranked.c.rank <= per_post)
+        .order_by(Comment.post_id, Comment.date, Comment.id)
+        .all()
+    )
+
+    previews = {}
+    for comment in rows:
+        previews.setdefault(comment.post_id, []).append(comment)
+    return previews
+
+
+def get_comments_page(post_id, before_id=None, limit=FEED_PAGE_SIZE):
+    """Keyset-paginated comments of one post, newest first. Returns (comments, next_before_id)."""
+    query = (
+        Comment.query
+        .join(Comment.user)
+        .options(contains_eager(Comment.user))
+        .filter(Comment.post_id == post_id)
+        .order_by(Comment.id.desc())
+    )
+    if before_id:
+        query = query.filter(Comment.id < before_id)
+    comments = query.limit(limit + 1).all()
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+    next_before_id = comments[-1].id if has_more else None
+    return comments, next_before_id
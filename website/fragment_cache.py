@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from .config import env_bool
+
+FRAGMENT_CACHE_ENABLED = env_bool('FRAGMENT_CACHE', True)
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000))
+FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class FragmentCache:
+    """
+    Rendered HTML fragments keyed by (name, object id, version...), bounded by entry count and size.
+
+    Least recently used fragments are evicted first. Keys carry a version such as a
+    date or counter, so most changes need no invalidation at all; write routes call
+    invalidate() for changes the key can't see. The cache is per process.
+    """
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_MAX_ENTRIES, max_bytes=FRAGMENT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            counter = self.misses if value is None else self.hits
+            counter[key[0]] = counter.get(key[0], 0) + 1
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = value
+            self.size += len(value)
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        if not FRAGMENT_CACHE_ENABLED:
+            return render()
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, name, object_id=None):
+        """Drop every fragment called `name`, or only those for one object id. Returns how many."""
+        with self.lock:
+            stale = [key for key in self.entries if key[0] == name and (object_id is None or key[1:2] == (object_id,))]
+            for key in stale:
+                self.size -= len(self.entries.pop(key))
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            names = sorted(set(self.hits) | set(self.misses))
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "by_name": {
+                    name: {"hits": self.hits.get(name, 0), "misses": self.misses.get(name, 0)} for name in names
+                },
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja tag caching the enclosed markup in fragment_cache:
+
+        {% cache 'post-body', post.id, post.date %} ... {% endcache %}
+
+    The first argument names the fragment, the second should be the object id (what
+    invalidate() matches on) and the rest are versions. Only cache markup that looks
+    the same to every viewer.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.Tuple(key, 'load')])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        return fragment_cache.get_or_render(key, lambda: Markup(caller()))
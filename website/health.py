@@ -0,0 +1,68 @@
+import os
+import time
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import inspect, text
+from website import db
+from .community_events import get_broker
+
+health = Blueprint('health', __name__)
+
+# Tables that must exist before a worker takes traffic; created by `flask bootstrap-db`
+REQUIRED_TABLES = ('user', 'post', 'exercise', 'exercise_library', 'chat_message')
+
+_schema_ready = False
+
+
+def record_first_request(app, started):
+    """Record how long after `started` (a time.perf_counter() value) the first request arrived."""
+    app.extensions['startup']['_started'] = started
+    app.extensions['startup']['first_request_seconds'] = None
+
+    @app.before_request
+    def note_first_request():
+        startup = app.extensions['startup']
+        if startup['first_request_seconds'] is None:
+            startup['first_request_seconds'] = round(time.perf_counter() - startup['_started'], 4)
+
+
+def startup_report(app):
+    return {key: value for key, value in app.extensions['startup'].items() if not key.startswith('_')}
+
+
+def check_schema():
+    """Whether the required tables exist. Only checked until it first succeeds."""
+    global _schema_ready
+    if not _schema_ready:
+        existing = set(inspect(db.engine).get_table_names())
+        _schema_ready = all(table in existing for table in REQUIRED_TABLES)
+    return _schema_ready
+
+
+@health.route('/healthz')
+def liveness():
+    """Liveness: the process is up and serving requests. Never touches the database."""
+    return jsonify(status='ok', pid=os.getpid())
+
+
+@health.route('/readyz')
+def readiness():
+    """Readiness: the database and event broker answer and the schema is in place, so this worker can take traffic."""
+    checks = {}
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks['database'] = 'ok'
+        checks['schema'] = 'ok' if check_schema() else 'missing tables; run `flask bootstrap-db`'
+    except Exception as e:
+        db.session.rollback()
+        checks['database'] = f'error: {e.__class__.__name__}'
+    try:
+        get_broker().ping()
+        checks['events'] = 'ok'
+    except Exception as e:
+        checks['events'] = f'error: {e.__class__.__name__}'
+    ready = all(value == 'ok' for value in checks.values()) and len(checks) == 3
+    return jsonify(
+        status='ready' if ready else 'unavailable',
+        checks=checks,
+        startup=startup_report(current_app),
+    ), 200 if ready else 503
@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from website import db
+from .models import User
+
+IDENTITY_TTL_SECONDS = float(os.environ.get('IDENTITY_TTL_SECONDS', 30))
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+
+# The only User columns pages need for the logged-in user; the password hash stays in the database
+IDENTITY_COLUMNS = (User.id, User.username, User.email, User.date_joined)
+
+_identities = OrderedDict()
+_lock = threading.Lock()
+
+
+class SessionUser(UserMixin):
+    """Read-only stand-in for User as current_user. Load the User row for anything it lacks."""
+
+    def __init__(self, id, username, email, date_joined):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.date_joined = date_joined
+
+
+def load_identity(user_id):
+    """
+    Flask-Login user loader backed by a short-TTL, size-bounded in-process cache.
+
+    A hit costs no database round-trip; a miss selects only IDENTITY_COLUMNS.
+    Returns None for unknown or deleted users, which Flask-Login treats as logged out.
+    """
+    now = time.monotonic()
+    with _lock:
+        cached = _identities.get(user_id)
+        if cached is not None and cached[1] > now:
+            _identities.move_to_end(user_id)
+            return cached[0]
+
+    row = (
+        db.session.query(*IDENTITY_COLUMNS)
+        .filter(User.id == user_id, User.deleted_at.is_(None))
+        .first()
+    )
+    if row is None:
+        invalidate_identity(user_id)
+        return None
+
+    identity = SessionUser(*row)
+    with _lock:
+        _identities[user_id] = (identity, now + IDENTITY_TTL_SECONDS)
+        _identities.move_to_end(user_id)
+        while len(_identities) > IDENTITY_CACHE_SIZE:
+            _identities.popitem(last=False)
+    return identity
+
+
+def invalidate_identity(user_id):
+    with _lock:
+        _identities.pop(user_id, None)
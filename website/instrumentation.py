@@ -0,0 +1,264 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from .config import env_bool
+
+# Queries slower than this are printed and counted by fingerprint
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+# Distinct slow-query fingerprints kept; the least frequent is dropped past this
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 200))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'fitfusion'
+
+PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+class Metrics:
+    """Per-endpoint request totals and slow-query fingerprints, shared by all threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.slow_queries = {}
+
+    def record_request(self, endpoint, stats, seconds, status_code):
+        with self.lock:
+            totals = self.endpoints.setdefault(endpoint, EndpointStats())
+            totals.requests += 1
+            totals.errors += status_code >= 500
+            totals.queries += stats.queries
+            totals.seconds += seconds
+            totals.db_seconds += stats.db_seconds
+            totals.render_seconds += stats.render_seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    totals.buckets[i] += 1
+
+    def record_slow_query(self, fingerprint_id, fingerprint, seconds, endpoint):
+        with self.lock:
+            entry = self.slow_queries.get(fingerprint_id)
+            if entry is None:
+                if len(self.slow_queries) >= SLOW_QUERY_LOG_SIZE:
+                    rarest = min(self.slow_queries, key=lambda key: self.slow_queries[key]["count"])
+                    del self.slow_queries[rarest]
+                entry = self.slow_queries[fingerprint_id] = {
+                    "fingerprint": fingerprint, "count": 0, "seconds_total": 0.0, "seconds_max": 0.0, "endpoints": set(),
+                }
+            entry["count"] += 1
+            entry["seconds_total"] += seconds
+            entry["seconds_max"] = max(entry["seconds_max"], seconds)
+            if endpoint:
+                entry["endpoints"].add(endpoint)
+
+    def slow_query_report(self):
+        with self.lock:
+            entries = [
+                {
+                    "id": fingerprint_id,
+                    "fingerprint": entry["fingerprint"],
+                    "count": entry["count"],
+                    "seconds_total": round(entry["seconds_total"], 6),
+                    "seconds_max": round(entry["seconds_max"], 6),
+                    "endpoints": sorted(entry["endpoints"]),
+                }
+                for fingerprint_id, entry in self.slow_queries.items()
+            ]
+        return sorted(entries, key=lambda entry: -entry["seconds_total"])
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+            self.slow_queries.clear()
+
+
+metrics = Metrics()
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+
+
+def fingerprint(statement):
+    """Statement with literals and placeholder lists collapsed, so repeats of one query group together."""
+    text = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    text = re.sub(r"\b\d+(?:\.\d+)?\b", '?', text)
+    text = re.sub(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})*\s*\)", '(...)', text)
+    text = re.sub(r"\s+", ' ', text).strip()
+    return text
+
+
+def current_stats():
+    if has_request_context():
+        return g.get('instrumentation')
+    return None
+
+
+def init_instrumentation(app):
+    """
+    Record query count, DB time, render time and latency per endpoint when enabled.
+
+    Opt in with INSTRUMENTATION=1 in the environment or app config. Every response
+    then carries X-Query-Count, X-DB-Time-Ms and a Server-Timing header, slow queries
+    are logged by fingerprint, and totals are exported at /internal/metrics. Streamed
+    responses are measured up to the point the body starts.
+    """
+    if not app.config.get('INSTRUMENTATION', env_bool('INSTRUMENTATION', False)):
+        return False
+
+    with app.app_context():
+        from website import db
+        engine = db.engine
+
+    # The start time lives on the statement's execution context, which is discarded
+    # with it, so a statement that raises leaves nothing behind on the connection
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context._query_started
+        stats = current_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += seconds
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            log_slow_query(statement, seconds)
+
+    @before_render_template.connect_via(app)
+    def before_render(sender, template, context, **extra):
+        stats = current_stats()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def after_render(sender, template, context, **extra):
+        stats = current_stats()
+        if stats is not None and stats.render_started is not None:
+            stats.render_seconds += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    @app.before_request
+    def start_request():
+        g.instrumentation = RequestStats()
+
+    @app.after_request
+    def finish_request(response):
+        stats = current_stats()
+        if stats is None:
+            return response
+        seconds = time.perf_counter() - stats.started
+        metrics.record_request(request.endpoint or 'unknown', stats, seconds, response.status_code)
+        response.headers['X-Query-Count'] = str(stats.queries)
+        response.headers['X-DB-Time-Ms'] = f"{stats.db_seconds * 1000:.1f}"
+        response.headers['Server-Timing'] = (
+            f"db;dur={stats.db_seconds * 1000:.1f}, render;dur={stats.render_seconds * 1000:.1f}, "
+            f"total;dur={seconds * 1000:.1f}"
+        )
+        return response
+
+    # Keep references so the signal receivers aren't garbage collected
+    app.extensions['instrumentation'] = (before_render, after_render)
+    return True
+
+
+def log_slow_query(statement, seconds):
+    text = fingerprint(statement)
+    fingerprint_id = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+    endpoint = request.endpoint if has_request_context() else None
+    metrics.record_slow_query(fingerprint_id, text, seconds, endpoint)
+    print(f"Slow query {seconds * 1000:.1f} ms [{fingerprint_id}] {endpoint or '-'}: {text[:500]}")
+
+
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def render_prometheus(pool=None, fragments=None, ttft=None, ai_cache=None):
+    """All request, slow-query, connection pool, fragment cache, chat latency and AI reply cache metrics in Prometheus text format."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{prometheus_label(val)}"' for key, val in labels)
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name} {value}")
+
+    with metrics.lock:
+        endpoints = sorted(metrics.endpoints.items())
+        metric('requests_total', 'counter', 'Requests handled.',
+               [((('endpoint', e),), t.requests) for e, t in endpoints])
+        metric('request_errors_total', 'counter', 'Requests answered with a 5xx status.',
+               [((('endpoint', e),), t.errors) for e, t in endpoints])
+        metric('request_queries_total', 'counter', 'SQL statements run while handling requests.',
+               [((('endpoint', e),), t.queries) for e, t in endpoints])
+        metric('request_db_seconds_total', 'counter', 'Time spent in SQL statements.',
+               [((('endpoint', e),), round(t.db_seconds, 6)) for e, t in endpoints])
+        metric('request_render_seconds_total', 'counter', 'Time spent rendering templates.',
+               [((('endpoint', e),), round(t.render_seconds, 6)) for e, t in endpoints])
+        lines.append(f"# HELP {METRIC_PREFIX}_request_duration_seconds Request latency up to the first response byte.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_request_duration_seconds histogram")
+        for endpoint, totals in endpoints:
+            label = prometheus_label(endpoint)
+            for bound, count in zip(LATENCY_BUCKETS, totals.buckets):
+                lines.append(f'{METRIC_PREFIX}_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {totals.requests}')
+            lines.append(f'{METRIC_PREFIX}_request_duration_seconds_sum{{endpoint="{label}"}} {round(totals.seconds, 6)}')
+            lines.append(f'{METRIC_PREFIX}_request_duration_seconds_count{{endpoint="{label}"}} {totals.requests}')
+        slow = sorted(metrics.slow_queries.items())
+        metric('slow_queries_total', 'counter', f'Queries slower than {SLOW_QUERY_MS:g} ms, by fingerprint id.',
+               [((('fingerprint', key),), entry["count"]) for key, entry in slow])
+
+    if pool:
+        for key, value in pool.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric(f'db_pool_{key}', 'gauge', f'Connection pool {key.replace("_", " ")}.', [((), value)])
+
+    if fragments:
+        by_name = sorted(fragments["by_name"].items())
+        metric('fragment_cache_hits_total', 'counter', 'Fragment cache hits.',
+               [((('fragment', name),), counts["hits"]) for name, counts in by_name])
+        metric('fragment_cache_misses_total', 'counter', 'Fragment cache misses.',
+               [((('fragment', name),), counts["misses"]) for name, counts in by_name])
+        metric('fragment_cache_evictions_total', 'counter', 'Fragments evicted to stay within size limits.',
+               [((), fragments["evictions"])])
+        metric('fragment_cache_entries', 'gauge', 'Fragments cached.', [((), fragments["entries"])])
+        metric('fragment_cache_bytes', 'gauge', 'Characters of cached markup.', [((), fragments["bytes"])])
+
+    if ttft and ttft["count"]:
+        metric('chat_ttft_seconds', 'summary', 'Time to the first token of recent streamed chat replies.',
+               [((('quantile', '0.5'),), ttft["p50_ms"] / 1000), ((('quantile', '0.95'),), ttft["p95_ms"] / 1000)])
+        lines.append(f"{METRIC_PREFIX}_chat_ttft_seconds_count {ttft['count']}")
+
+    if ai_cache:
+        metric('ai_cache_hits_total', 'counter', 'Chat replies served from the AI reply cache.', [((), ai_cache["hits"])])
+        metric('ai_cache_misses_total', 'counter', 'AI reply cache lookups that found nothing.', [((), ai_cache["misses"])])
+        metric('ai_cache_bypassed_total', 'counter', 'Context-dependent questions that skipped the AI reply cache.',
+               [((), ai_cache["bypassed"])])
+        metric('ai_cache_errors_total', 'counter', 'AI reply cache reads and writes that failed and were skipped.',
+               [((), ai_cache["errors"])])
+        if ai_cache["size"] is not None:
+            metric('ai_cache_entries', 'gauge', 'Replies in the AI reply cache.', [((), ai_cache["size"])])
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,62 @@
+import hmac
+import os
+from functools import wraps
+from flask import Blueprint, Response, jsonify, request, abort
+from website import db
+from .config import env_bool
+
+internal = Blueprint('internal', __name__)
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+# Trust local requests without the token. Off by default: behind a reverse proxy on the
+# same host every external request arrives from loopback too
+INTERNAL_TRUST_LOOPBACK = env_bool('INTERNAL_TRUST_LOOPBACK', False)
+
+
+def internal_only(view):
+    """Allow a view only with the INTERNAL_TOKEN in X-Internal-Token (or from loopback, if trusted)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get('INTERNAL_TOKEN')
+        supplied = request.headers.get('X-Internal-Token', '')
+        if token and hmac.compare_digest(supplied, token):
+            return view(*args, **kwargs)
+        if INTERNAL_TRUST_LOOPBACK and request.remote_addr in LOOPBACK_ADDRESSES:
+            return view(*args, **kwargs)
+        abort(404)
+    return wrapper
+
+
+@internal.route('/pool')
+@internal_only
+def pool():
+    from .config import pool_status
+    return jsonify(pool_status(db.engine))
+
+
+@internal.route('/metrics')
+@internal_only
+def prometheus_metrics():
+    from .config import pool_status
+    from .instrumentation import render_prometheus
+    from .fragment_cache import fragment_cache
+    from .chat_jobs import ttft_summary
+    from .ai_agent import get_cache
+    cache = get_cache()
+    return Response(render_prometheus(pool_status(db.engine), fragment_cache.stats(), ttft_summary(),
+                                      cache.stats() if cache else None),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@internal.route('/fragment-cache')
+@internal_only
+def fragment_cache_stats():
+    from .fragment_cache import fragment_cache
+    return jsonify(fragment_cache.stats())
+
+
+@internal.route('/slow-queries')
+@internal_only
+def slow_queries():
+    from .instrumentation import metrics, SLOW_QUERY_MS
+    return jsonify({"threshold_ms": SLOW_QUERY_MS, "queries": metrics.slow_query_report()})
@@ -2,18 +2,27 @@ from website import db
 from flask_login import UserMixin
 from datetime import datetime, timezone, timedelta
 
+def local_now():
+    return datetime.now(timezone.utc) + timedelta(hours=1)
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True)
     username = db.Column(db.String(50), unique=True)
-    password = db.Column(db.String(150))
-    date_joined = db.Column(db.DateTime, default=datetime.now(timezone.utc) + timedelta(hours=1))
+    password = db.Column(db.String(255))
+    date_joined = db.Column(db.DateTime, default=local_now)
+    deleted_at = db.Column(db.DateTime)
     exercises = db.relationship('Exercise', backref='user', lazy=True, cascade="all, delete-orphan")
     posts = db.relationship('Post', backref='user', lazy=True, cascade="all, delete-orphan")
     comments = db.relationship('Comment', backref='user', lazy=True, cascade="all, delete-orphan")
     chat_messages = db.relationship('ChatMessage', backref='user', lazy=True, cascade="all, delete-orphan")
+    daily_activity = db.relationship('DailyActivity', lazy=True, cascade="all, delete-orphan")
+    chat_summary = db.relationship('ChatSummary', lazy=True, cascade="all, delete-orphan")
 
 class ExerciseLibrary(db.Model):
+    __table_args__ = (
+        db.Index('ix_exercise_library_filters', 'difficulty', 'exercise_type', 'requires_equipment'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -28,44 +37,96 @@ class ExerciseLibrary(db.Model):
     image_url = db.Column(db.String(200))
 
 class Exercise(db.Model):
+    __table_args__ = (
+        db.Index('ix_exercise_user_date', 'user_id', 'date_completed'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
     title = db.Column(db.String(100))
     duration_minutes = db.Column(db.Integer)
     calories_burned = db.Column(db.Integer)
     exercise_type = db.Column(db.String(100))
-    date_completed = db.Column(db.DateTime, default=datetime.now(timezone.utc) + timedelta(hours=1))
+    date_completed = db.Column(db.DateTime, default=local_now)
+
+class DailyActivity(db.Model):
+    __table_args__ = (
+        db.Index('uq_daily_activity_user_day', 'user_id', 'day', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    sessions = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    minutes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    calories = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index('ix_post_date_id', 'date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
     content = db.Column(db.String(500))
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     likes = db.relationship('Like', backref='post', lazy=True, cascade="all, delete-orphan")
-    
-    def like_count(self):
-        return len(self.likes)
-    
-    def is_liked_by(self, user):
-        return any(like.user_id == user.id for like in self.likes)
-    
-    date = db.Column(db.DateTime, default=datetime.now(timezone.utc) + timedelta(hours=1))
+    date =db.Column(db.DateTime, default=local_now)
     comments = db.relationship('Comment', backref='post', lazy=True, cascade="all, delete-orphan")
+    terms = db.relationship('PostTerm', lazy=True, cascade="all, delete-orphan")
+
+class PostTerm(db.Model):
+    __table_args__ = (
+        db.Index('ix_post_term_post', 'post_id'),
+        db.Index('ix_post_term_term_weight', 'term', 'weight', 'post_id'),
+    )
+    term = db.Column(db.String(40), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    weight = db.Column(db.Integer, nullable=False, default=1)
 
 class Comment(db.Model):
+    __table_args__ = (
+        db.Index('ix_comment_post_date_id', 'post_id', 'date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'))
     content = db.Column(db.String(300))
-    date = db.Column(db.DateTime, default=datetime.now(timezone.utc) + timedelta(hours=1))
+    date = db.Column(db.DateTime, default=local_now)
 
 class Like(db.Model):
+    __table_args__ = (
+        db.Index('ix_like_post_user', 'post_id', 'user_id'),
+        db.Index('uq_like_user_post', 'user_id', 'post_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'))
 
 class ChatMessage(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_message_user_status', 'user_id', 'status'),
+        db.Index('ix_chat_message_user_id', 'user_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
     message = db.Column(db.String(500))
     sender = db.Column(db.String(20))
-    date = db.Column(db.DateTime, default=datetime.now(timezone.utc) + timedelta(hours=1))
\ No newline at end of file
+    status = db.Column(db.String(20))
+    date = db.Column(db.DateTime, default=local_now)
+
+class ChatSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), unique=True, nullable=False)
+    summary = db.Column(db.Text)
+    last_message_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=local_now, onupdate=local_now)
+
+class AccountDeletion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    token = db.Column(db.String(64), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    stage = db.Column(db.String(50))
+    rows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=local_now)
+    updated_at = db.Column(db.DateTime, default=local_now, onupdate=local_now)
@@ -0,0 +1,114 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Werkzeug method string ('pbkdf2:sha256:600000', 'scrypt:32768:8:1', ...) or 'argon2'
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+# 'thread' (hashlib releases the GIL while hashing) or 'process'
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+# Hashes allowed to be queued or running at once; beyond that requests are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', PASSWORD_HASH_WORKERS * 8))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+
+DEFAULT_SCRYPT_PARAMS = '32768:8:1'
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+def normalize_method(method):
+    """Spell out Werkzeug's implicit defaults so the method can be compared with stored hashes."""
+    if method == 'pbkdf2':
+        method = 'pbkdf2:sha256'
+    if method.startswith('pbkdf2:') and method.count(':') == 1:
+        return f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+    if method == 'scrypt':
+        return f'scrypt:{DEFAULT_SCRYPT_PARAMS}'
+    return method
+
+
+def argon2_hasher():
+    from argon2 import PasswordHasher
+    return PasswordHasher(
+        time_cost=int(os.environ.get('ARGON2_TIME_COST', 3)),
+        memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 65536)),
+        parallelism=int(os.environ.get('ARGON2_PARALLELISM', 1)),
+    )
+
+
+def _hash(password, method):
+    if method == 'argon2':
+        return argon2_hasher().hash(password)
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored_hash, password):
+    if stored_hash.startswith('$argon2'):
+        from argon2.exceptions import VerificationError, InvalidHashError
+        try:
+            return argon2_hasher().verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(stored_hash, password)
+
+
+def needs_rehash(stored_hash, method=None):
+    """Whether a stored hash was made with a different scheme or cost than the configured one."""
+    if not stored_hash:
+        return False
+    method = normalize_method(method or PASSWORD_HASH_METHOD)
+    if method == 'argon2':
+        return not stored_hash.startswith('$argon2') or argon2_hasher().check_needs_rehash(stored_hash)
+    return stored_hash.split('$', 1)[0] != method
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == 'process':
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+    return _executor
+
+
+def run_bounded(fn, *args):
+    """
+    Run a hashing function on the shared pool and wait for its result.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once, so a login storm can't take
+    every core; past PASSWORD_HASH_MAX_PENDING waiting hashes, HashingBusy is raised
+    instead of queueing more work. A hash that takes longer than
+    PASSWORD_HASH_TIMEOUT_SECONDS also raises HashingBusy; it keeps its slot until it
+    actually finishes, so abandoned hashes still count against the bound.
+    """
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+    except FuturesTimeoutError:
+        raise HashingBusy()
+
+
+def hash_password(password):
+    return run_bounded(_hash, password, normalize_method(PASSWORD_HASH_METHOD))
+
+
+def verify_password(stored_hash, password):
+    if not stored_hash or password is None:
+        return False
+    return run_bounded(_verify, stored_hash, password)
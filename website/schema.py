@@ -0,0 +1,154 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn
+from website import db
+
+
+def sync_columns():
+    """
+    Add any column declared on the models that is missing from an existing table.
+
+    db.create_all() only creates whole tables, so columns added to a model later
+    have to be added here. New columns need a server_default if they are NOT NULL.
+    Returns a list of (table, column) pairs that were added.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+            added.append((table.name, column.name))
+            print(f"Added column '{column.name}' to '{table.name}'.")
+
+    return added
+
+
+def sync_indexes():
+    """
+    Create any index declared on the models that is missing from the database.
+
+    db.create_all() only creates whole tables, so indexes added to a model after
+    its table already exists have to be created here. A unique index that can't be
+    built because of duplicate rows is reported and skipped instead of blocking startup.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=db.engine)
+            except DBAPIError as e:
+                if not index.unique:
+                    raise
+                print(f"Could not create unique index '{index.name}' on '{table.name}': {e.orig}")
+                continue
+            print(f"Created index '{index.name}' on '{table.name}'.")
+
+
+def widen_string_columns():
+    """
+    Enlarge VARCHAR columns that are shorter in the database than on the model.
+
+    Only MySQL enforces VARCHAR lengths; SQLite ignores them. Used so longer
+    password hashes (scrypt, argon2) fit in tables created with the old size.
+    """
+    if db.engine.dialect.name != 'mysql':
+        return []
+
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = db.engine.dialect.identifier_preparer
+    widened = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        lengths = {column['name']: getattr(column['type'], 'length', None) for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            wanted = getattr(column.type, 'length', None)
+            current = lengths.get(column.name)
+            if not wanted or not current or current >= wanted:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} MODIFY COLUMN {column_ddl}"))
+            widened.append((table.name, column.name))
+            print(f"Widened column '{column.name}' on '{table.name}' to {wanted}.")
+
+    return widened
+
+
+def normalize_ondelete(action):
+    action = (action or '').upper()
+    return None if action in ('', 'NO ACTION', 'RESTRICT') else action
+
+
+def foreign_key_changes(table, existing_keys):
+    """
+    (existing key name, model constraint) pairs whose ON DELETE action differs from the model.
+
+    `existing_keys` is what the inspector reports for the table; keys are matched on
+    their columns and referred table.
+    """
+    changes = []
+    for constraint in table.foreign_key_constraints:
+        columns = [column.name for column in constraint.columns]
+        for key in existing_keys:
+            if key['constrained_columns'] != columns or key['referred_table'] != constraint.referred_table.name:
+                continue
+            if normalize_ondelete(key.get('options', {}).get('ondelete')) != normalize_ondelete(constraint.ondelete):
+                changes.append((key['name'], constraint))
+    return changes
+
+
+def sync_foreign_keys():
+    """
+    Recreate foreign keys whose ON DELETE action differs from the models.
+
+    db.create_all() only applies ondelete='CASCADE' to new tables, so tables created
+    before it keep constraints that block or orphan child rows. MySQL only: SQLite
+    can't alter a constraint (and doesn't enforce them by default), so there the
+    app-side cascades on the relationships do the cleanup. Returns (table, key) pairs.
+    """
+    if db.engine.dialect.name != 'mysql':
+        return []
+
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = db.engine.dialect.identifier_preparer
+    changed = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        for name, constraint in foreign_key_changes(table, inspector.get_foreign_keys(table.name)):
+            columns = ', '.join(preparer.quote(column.name) for column in constraint.columns)
+            referred = ', '.join(preparer.quote(element.column.name) for element in constraint.elements)
+            ondelete = f" ON DELETE {constraint.ondelete}" if constraint.ondelete else ''
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} DROP FOREIGN KEY {preparer.quote(name)}"))
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD CONSTRAINT {preparer.quote(name)} "
+                    f"FOREIGN KEY ({columns}) REFERENCES {preparer.format_table(constraint.referred_table)} "
+                    f"({referred}){ondelete}"
+                ))
+            changed.append((table.name, name))
+            print(f"Recreated foreign key '{name}' on '{table.name}' with ON DELETE {constraint.ondelete or 'NO ACTION'}.")
+
+    return changed
@@ -0,0 +1,211 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from sqlalchemy import case, func, select, union
+from sqlalchemy.orm import contains_eager
+from website import db
+from .models import Post, PostTerm, User
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE = 50
+MAX_QUERY_TERMS = 8
+INDEX_BATCH_SIZE = 500
+# Terms found in more than this share of posts carry almost no signal and are skipped
+COMMON_TERM_RATIO = 0.5
+# Postings read per query term, best weight first (newest on ties); only these posts are ranked,
+# so a query costs the same however common its terms are
+MAX_CANDIDATES_PER_TERM = int(os.environ.get('SEARCH_CANDIDATES_PER_TERM', 1000))
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for", "from",
+    "has", "have", "how", "i", "if", "in", "into", "is", "it", "its", "me", "my", "of",
+    "on", "or", "so", "that", "the", "their", "them", "then", "there", "these", "this",
+    "to", "was", "we", "were", "what", "when", "which", "who", "why", "will", "with",
+    "you", "your",
+}
+
+_post_total = (0, 0.0)
+_post_total_lock = threading.Lock()
+# term -> (document frequency, fetched at); counting a common term's postings costs as much as ranking them
+_doc_freqs = {}
+_doc_freqs_lock = threading.Lock()
+DOC_FREQ_CACHE_SIZE = 10000
+POST_TOTAL_TTL_SECONDS = 60
+
+
+def tokenize(text):
+    """Lower-case word tokens without stopwords, with plural 's' stripped so 'squats' finds 'squat'."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word[:40])
+    return tokens
+
+
+def term_frequencies(text):
+    return Counter(tokenize(text))
+
+
+def index_post(post):
+    """Add a post's terms to the inverted index. Call after the post has an id, before commit."""
+    db.session.flush()
+    rows = [
+        {"term": term, "post_id": post.id, "weight": count}
+        for term, count in term_frequencies(post.content).items()
+    ]
+    if rows:
+        db.session.bulk_insert_mappings(PostTerm, rows)
+
+
+def unindex_post(post_id):
+    PostTerm.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+
+
+def rebuild_post_index(batch_size=INDEX_BATCH_SIZE):
+    """Rebuild the post index from scratch, reading and writing in id-ordered batches."""
+    PostTerm.query.delete(synchronize_session=False)
+    db.session.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        posts = (
+            db.session.query(Post.id, Post.content)
+            .filter(Post.id > last_id)
+            .order_by(Post.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not posts:
+            break
+        rows = [
+            {"term": term, "post_id": post_id, "weight": count}
+            for post_id, content in posts
+            for term, count in term_frequencies(content).items()
+        ]
+        if rows:
+            db.session.bulk_insert_mappings(PostTerm, rows)
+        db.session.commit()
+        indexed += len(posts)
+        last_id = posts[-1].id
+    return indexed
+
+
+def post_total():
+    """Number of posts, cached briefly since it only feeds the idf weights."""
+    global _post_total
+    count, fetched_at = _post_total
+    if time.monotonic() - fetched_at > POST_TOTAL_TTL_SECONDS:
+        with _post_total_lock:
+            count = db.session.query(func.count(Post.id)).scalar()
+            _post_total = (count, time.monotonic())
+    return count
+
+
+def doc_frequencies(terms):
+    """Posts containing each term (terms in no post are left out), cached for POST_TOTAL_TTL_SECONDS."""
+    now = time.monotonic()
+    with _doc_freqs_lock:
+        cached = {term: _doc_freqs.get(term) for term in terms}
+    fresh = {term: entry[0] for term, entry in cached.items() if entry and now - entry[1] <= POST_TOTAL_TTL_SECONDS}
+    missing = [term for term in terms if term not in fresh]
+    if missing:
+        counted = dict(
+            db.session.query(PostTerm.term, func.count(PostTerm.post_id))
+            .filter(PostTerm.term.in_(missing))
+            .group_by(PostTerm.term)
+            .all()
+        )
+        with _doc_freqs_lock:
+            if len(_doc_freqs) > DOC_FREQ_CACHE_SIZE:
+                _doc_freqs.clear()
+            for term in missing:
+                _doc_freqs[term] = (counted.get(term, 0), now)
+        fresh.update((term, counted.get(term, 0)) for term in missing)
+    return {term: df for term, df in fresh.items() if df}
+
+
+def candidate_post_ids(terms, per_term=MAX_CANDIDATES_PER_TERM):
+    """
+    A select of the top `per_term` postings of each term, read off the
+    (term, weight, post_id) index so no posting list is scanned in full.
+    """
+    selects = []
+    for term in terms:
+        top = (
+            select(PostTerm.post_id)
+            .where(PostTerm.term == term)
+            .order_by(PostTerm.weight.desc(), PostTerm.post_id.desc())
+            .limit(per_term)
+            .subquery()
+        )
+        selects.append(select(top.c.post_id))
+    return union(*selects) if len(selects) > 1 else selects[0]
+
+
+def search_posts(query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Ranked full-text search over community posts. Returns (posts, has_more).
+
+    Posts are scored by summed tf-idf over the query terms, straight from the
+    PostTerm posting lists, newest first on ties. Posts of accounts being deleted
+    are left out. Only the candidate_post_ids() of each term are ranked, so very
+    common terms are capped rather than grouped in full; results past
+    MAX_CANDIDATES_PER_TERM per term are not reachable. Three queries: document
+    frequencies (usually cached), the ranked page of ids and the posts with their authors.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], False
+
+    doc_freqs = doc_frequencies(terms)
+    if not doc_freqs:
+        return [], False
+
+    # The cached total can lag behind new posts; never let it drop below a document frequency
+    total = max(post_total(), *doc_freqs.values())
+    useful = {term: df for term, df in doc_freqs.items() if df <= total * COMMON_TERM_RATIO} or doc_freqs
+    idf = {term: math.log((total + 1) / (df + 0.5)) + 0.01 for term, df in useful.items()}
+
+    score = func.sum(PostTerm.weight * case(idf, value=PostTerm.term, else_=0)).label('score')
+    offset = (page - 1) * page_size
+    ranked = (
+        db.session.query(PostTerm.post_id, score)
+        .join(Post, Post.id == PostTerm.post_id)
+        .join(User, User.id == Post.user_id)
+        .filter(PostTerm.term.in_(list(idf)), User.deleted_at.is_(None))
+        .filter(PostTerm.post_id.in_(candidate_post_ids(list(idf), MAX_CANDIDATES_PER_TERM)))
+        .group_by(PostTerm.post_id)
+        .order_by(score.desc(), PostTerm.post_id.desc())
+        .offset(offset)
+        .limit(page_size + 1)
+        .all()
+    )
+    has_more = len(ranked) > page_size
+    ranked = ranked[:page_size]
+    if not ranked:
+        return [], False
+
+    posts = {
+        post.id: post for post in
+        Post.query.join(Post.user).options(contains_eager(Post.user))
+        .filter(Post.id.in_([post_id for post_id, _ in ranked]), User.deleted_at.is_(None))
+        .all()
+    }
+    return [posts[post_id] for post_id, _ in ranked if post_id in posts], has_more
+
+
+def search_exercises(catalogue, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Ranked search over the cached exercise catalogue. Returns (entries, has_more)."""
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], False
+    ranked = catalogue.search(terms)
+    start = (page - 1) * page_size
+    return ranked[start:start + page_size], len(ranked) > start + page_size
@@ -0,0 +1,226 @@
+from datetime import date, timedelta
+from sqlalchemy import and_, func, or_
+from website import db
+from .models import Exercise, DailyActivity, local_now
+
+RECENT_LIMIT = 5
+TREND_WEEKS = 8
+TREND_MONTHS = 6
+REBUILD_BATCH_SIZE = 1000
+
+
+def get_totals(user_id):
+    """Session count, minutes and calories for a user, aggregated in the database."""
+    sessions, minutes, calories = (
+        db.session.query(
+            func.count(Exercise.id),
+            func.coalesce(func.sum(Exercise.duration_minutes), 0),
+            func.coalesce(func.sum(Exercise.calories_burned), 0),
+        )
+        .filter(Exercise.user_id == user_id)
+        .one()
+    )
+    return {
+        "total_sessions": sessions,
+        "total_minutes": int(minutes),
+        "calories_burned": int(calories),
+    }
+
+
+def get_recent(user_id, limit=RECENT_LIMIT):
+    return (
+        Exercise.query
+        .filter_by(user_id=user_id)
+        .order_by(Exercise.date_completed.desc(), Exercise.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def upsert_daily_activity(user_id, day, sessions, minutes, calories):
+    """Add (or with negative values, subtract) totals to a user's row for `day` in one statement."""
+    upsert_daily_activity_rows([dict(user_id=user_id, day=day, sessions=sessions, minutes=minutes, calories=calories)])
+
+
+def upsert_daily_activity_rows(rows):
+    """
+    Add totals to many (user_id, day) rollup rows in one multi-row statement.
+
+    Each row is a dict with user_id, day, sessions, minutes and calories; a
+    (user_id, day) pair may appear only once per call.
+    """
+    if not rows:
+        return
+    table = DailyActivity.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            sessions=table.c.sessions + stmt.inserted.sessions,
+            minutes=table.c.minutes + stmt.inserted.minutes,
+            calories=table.c.calories + stmt.inserted.calories,
+        )
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_=dict(
+                sessions=table.c.sessions + stmt.excluded.sessions,
+                minutes=table.c.minutes + stmt.excluded.minutes,
+                calories=table.c.calories + stmt.excluded.calories,
+            ),
+        )
+    else:
+        raise NotImplementedError(f"upsert_daily_activity is not supported for '{dialect}'")
+
+    db.session.execute(stmt)
+
+
+def record_exercise(exercise, sign=1):
+    """Fold a logged exercise into the daily rollup; pass sign=-1 when it is being deleted."""
+    db.session.flush()
+    upsert_daily_activity(
+        exercise.user_id,
+        exercise.date_completed.date(),
+        sign,
+        sign * (exercise.duration_minutes or 0),
+        sign * (exercise.calories_burned or 0),
+    )
+
+
+def local_today():
+    """Today on the same UTC+1 clock local_now() stamps exercises with."""
+    return local_now().date()
+
+
+def get_daily_activity(user_id, since, until):
+    return (
+        DailyActivity.query
+        .filter(DailyActivity.user_id == user_id, DailyActivity.day >= since, DailyActivity.day <= until,
+                DailyActivity.sessions > 0)
+        .order_by(DailyActivity.day)
+        .all()
+    )
+
+
+def get_weekly_trend(user_id, weeks=TREND_WEEKS, today=None):
+    """Per-week totals for the last `weeks` weeks (Monday-based), oldest first, including empty weeks."""
+    today = today or local_today()
+    this_week = today - timedelta(days=today.weekday())
+    first_week = this_week - timedelta(weeks=weeks - 1)
+
+    buckets = {first_week + timedelta(weeks=i): empty_bucket() for i in range(weeks)}
+    for row in get_daily_activity(user_id, first_week, today):
+        bucket = buckets.get(row.day - timedelta(days=row.day.weekday()))
+        if bucket is not None:
+            add_to_bucket(bucket, row)
+    return [dict(start=start, **totals) for start, totals in sorted(buckets.items())]
+
+
+def get_monthly_trend(user_id, months=TREND_MONTHS, today=None):
+    """Per-calendar-month totals for the last `months` months, oldest first, including empty months."""
+    today = today or local_today()
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+
+    buckets = {start: empty_bucket() for start in starts}
+    for row in get_daily_activity(user_id, starts[-1], today):
+        bucket = buckets.get(row.day.replace(day=1))
+        if bucket is not None:
+            add_to_bucket(bucket, row)
+    return [dict(start=start, **totals) for start, totals in sorted(buckets.items())]
+
+
+def empty_bucket():
+    return {"sessions": 0, "minutes": 0, "calories": 0}
+
+
+def add_to_bucket(bucket, row):
+    bucket["sessions"] += row.sessions
+    bucket["minutes"] += row.minutes
+    bucket["calories"] += row.calories
+
+
+def get_streaks(user_id, today=None):
+    """
+    Current and longest run of consecutive active days.
+
+    The current streak is still alive if the last active day is today or yesterday.
+    Reads one small row per active day, never the individual sessions.
+    """
+    today = today or local_today()
+    days = [
+        row[0] for row in
+        db.session.query(DailyActivity.day)
+        .filter(DailyActivity.user_id == user_id, DailyActivity.day <= today, DailyActivity.sessions > 0)
+        .order_by(DailyActivity.day)
+        .all()
+    ]
+
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    current = run if previous and today - previous <= timedelta(days=1) else 0
+    return {"current_streak": current, "longest_streak": longest}
+
+
+def rebuild_daily_activity(user_id=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute the DailyActivity rollup from the Exercise table, for one user or everyone.
+
+    Aggregation happens in the database, grouped by user and day, and is read in
+    keyset-paged batches on (user_id, day) that are each fully fetched before they
+    are written back, so no result is still streaming while the inserts run.
+    Returns the number of rollup rows written.
+    """
+    delete_query = DailyActivity.query
+    day_column = func.date(Exercise.date_completed)
+    aggregate = db.session.query(
+        Exercise.user_id,
+        day_column,
+        func.count(Exercise.id),
+        func.coalesce(func.sum(Exercise.duration_minutes), 0),
+        func.coalesce(func.sum(Exercise.calories_burned), 0),
+    ).filter(Exercise.user_id.isnot(None), Exercise.date_completed.isnot(None))
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+        aggregate = aggregate.filter(Exercise.user_id == user_id)
+    aggregate = aggregate.group_by(Exercise.user_id, day_column).order_by(Exercise.user_id, day_column)
+
+    delete_query.delete(synchronize_session=False)
+
+    written = 0
+    last = None
+    while True:
+        page = aggregate
+        if last is not None:
+            page = page.filter(or_(Exercise.user_id > last[0], and_(Exercise.user_id == last[0], day_column > last[1])))
+        groups = page.limit(batch_size).all()
+        if not groups:
+            break
+        last = groups[-1][:2]
+        batch = []
+        for uid, day, sessions, minutes, calories in groups:
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            batch.append(dict(user_id=uid, day=day, sessions=sessions, minutes=int(minutes), calories=int(calories)))
+        db.session.bulk_insert_mappings(DailyActivity, batch)
+        written += len(batch)
+        if len(groups) < batch_size:
+            break
+
+    db.session.commit()
+    return written
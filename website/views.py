@@ -1,55 +1,84 @@
-from flask import Blueprint, app, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, app, render_template, request, jsonify, flash, redirect, url_for, Response, stream_with_context, abort
 from flask_login import login_required, current_user
 from website import db
-from .models import Like
 import json
+import hashlib
 
 views = Blueprint('views', __name__)
 
 @views.route('/', methods=['GET', 'POST'])
 def home():
     from .models import User
-    return render_template('home.html', user=current_user)
+    # Set by /delete-account so the landing page can follow the deletion job
+    token = request.args.get('deletion')
+    deletion_url = url_for('auth.account_deletion_status', token=token) if token else None
+    return render_template('home.html', user=current_user, deletion_url=deletion_url)
 
 @views.route('/exercises', methods=['GET', 'POST'])
 def exercises():
-    from .models import ExerciseLibrary
+    from .catalogue import get_catalogue, invalidate_catalogue
     
     difficulty = request.args.get('difficulty', '')
     exercise_type = request.args.get('type', '')
     equipment = request.args.get('equipment', '')
 
-    query = ExerciseLibrary.query
-
-    if difficulty:
-        query = query.filter_by(difficulty=difficulty)
-    if exercise_type:
-        query = query.filter_by(exercise_type=exercise_type)
-    if equipment == 'no':
-        query = query.filter_by(requires_equipment=False)
-    elif equipment == 'yes':
-        query = query.filter_by(requires_equipment=True)
-
-    exercises = query.all()
-
-    if ExerciseLibrary.query.count() == 0:
+    catalogue = get_catalogue()
+    if not catalogue.entries:
         populate_sample_exercises()
-        exercises = query.all()
+        invalidate_catalogue()
+        catalogue = get_catalogue()
 
-    return render_template('exercises.html', user=current_user, exercises=exercises)
+    def render():
+        exercises = catalogue.filter(difficulty, exercise_type, equipment)
+        return render_template('exercises.html', user=current_user, exercises=exercises,
+                               facets=catalogue.facet_counts())
+
+    return conditional_page(catalogue, f"{difficulty}|{exercise_type}|{equipment}", render)
 
 @views.route('/exercise/<int:exercise_id>')
 def exercise_detail(exercise_id):
-    from .models import ExerciseLibrary
-    exercise = ExerciseLibrary.query.get_or_404(exercise_id)
-    return render_template('exercise_detail.html', user=current_user, exercise=exercise)
+    from .catalogue import get_catalogue
+    catalogue = get_catalogue()
+    exercise = catalogue.get(exercise_id)
+    if exercise is None:
+        abort(404)
+    return conditional_page(
+        catalogue, f"detail|{exercise_id}",
+        lambda: render_template('exercise_detail.html', user=current_user, exercise=exercise)
+    )
+
+def conditional_page(catalogue, variant, render):
+    """
+    Serve a catalogue page with ETag/Last-Modified validators, rendering it only when needed.
+
+    The ETag covers the catalogue version, the page variant and whether the visitor is
+    logged in, so a browser or proxy revalidating an unchanged page gets a bodyless 304.
+    A full render is kept in the fragment cache under the same key, since these pages
+    differ only by login state.
+    """
+    from .fragment_cache import fragment_cache
+    key = f"{catalogue.version}|{variant}|{current_user.is_authenticated}"
+    response = Response(mimetype='text/html')
+    response.set_etag(hashlib.sha1(key.encode('utf-8')).hexdigest(), weak=True)
+    response.last_modified = catalogue.loaded_at
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    response.set_data(fragment_cache.get_or_render(('catalogue-page', key), render))
+    return response
 
 @views.route('/log-exercise/<int:exercise_id>', methods=['POST'])
 @login_required
 def log_completed_exercise(exercise_id):
-    from .models import ExerciseLibrary, Exercise
+    from .models import Exercise
+    from .catalogue import get_catalogue
+    from .stats import record_exercise
     
-    exercise_lib = ExerciseLibrary.query.get_or_404(exercise_id)
+    exercise_lib = get_catalogue().get(exercise_id)
+    if exercise_lib is None:
+        abort(404)
     
     new_exercise = Exercise(
         user_id=current_user.id,
@@ -59,37 +88,91 @@ def log_completed_exercise(exercise_id):
         calories_burned=exercise_lib.calories_burned
     )
     db.session.add(new_exercise)
+    record_exercise(new_exercise)
     db.session.commit()
     
     flash(f'Successfully logged {exercise_lib.name}!', category='success')
     return redirect(url_for('views.exercises', exercise_id=exercise_id))
 
+@views.route('/api/exercises/log', methods=['POST'])
+@login_required
+def log_exercises_api():
+    from .catalogue import get_catalogue
+    from .exercise_log import log_sessions, SessionError, MAX_BATCH_SIZE
+    data = request.get_json(silent=True) or {}
+    sessions = data.get('sessions')
+    if not isinstance(sessions, list) or not sessions:
+        return jsonify(error='Send a non-empty "sessions" list.'), 400
+    if len(sessions) > MAX_BATCH_SIZE:
+        return jsonify(error=f'At most {MAX_BATCH_SIZE} sessions per request; use /api/exercises/import for more.'), 413
+    try:
+        logged = log_sessions(current_user.id, sessions, get_catalogue())
+    except SessionError as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    return jsonify(logged=logged), 201
+
+@views.route('/api/exercises/import', methods=['POST'])
+@login_required
+def import_exercises_api():
+    from .catalogue import get_catalogue
+    from .exercise_log import import_sessions, import_format
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = upload.stream
+        fmt = import_format(upload.mimetype, upload.filename)
+    else:
+        stream = request.stream
+        fmt = import_format(request.content_type)
+    fmt = request.args.get('format', fmt)
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify(error='Send a CSV or JSON-lines file, or pass ?format=csv|jsonl.'), 415
+    result = import_sessions(current_user.id, stream, fmt, get_catalogue())
+    return jsonify(result), 200
+
+@views.route('/export/<any(exercises, posts, comments, chat):kind>.<any(csv, jsonl):fmt>')
+@login_required
+def export_data(kind, fmt):
+    from .exports import stream_export
+    filename = f"{kind}.{fmt}"
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    headers = {'Cache-Control': 'no-store', 'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip']:
+        # Compressed in transit; the browser saves the plain file
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return Response(stream_with_context(stream_export(kind, current_user.id, fmt)),
+                    mimetype=mimetype, headers=headers)
+
 @views.route('/dashboard', methods=['GET', 'POST'])
 def dashboard():
     stats = {}
     recent = []
+    weekly = []
+    monthly = []
     if current_user.is_authenticated:
-        from .models import Exercise
-        exercises = Exercise.query.filter_by(user_id=current_user.id).order_by(Exercise.date_completed.desc()).all()
-        total_sessions = len(exercises)
-        total_minutes = sum(e.duration_minutes or 0 for e in exercises)
-        calories_burned = sum(e.calories_burned or 0 for e in exercises)
-        recent = exercises[:5]
-        stats = {
-            "total_sessions": total_sessions,
-            "total_minutes": total_minutes,
-            "calories_burned": calories_burned
-        }
-    return render_template('dashboard.html', user=current_user, stats=stats, recent=recent)
+        from .stats import get_totals, get_recent, get_streaks, get_weekly_trend, get_monthly_trend
+        stats = get_totals(current_user.id)
+        stats.update(get_streaks(current_user.id))
+        recent = get_recent(current_user.id)
+        weekly = get_weekly_trend(current_user.id)
+        monthly = get_monthly_trend(current_user.id)
+    return render_template('dashboard.html', user=current_user, stats=stats, recent=recent,
+                           weekly=weekly, monthly=monthly)
 
 @views.route('/delete-exercise/<int:exercise_id>', methods=['POST'])
 @login_required
 def delete_exercise(exercise_id):
     from .models import Exercise
+    from .stats import record_exercise
     ex = Exercise.query.get_or_404(exercise_id)
     if ex.user_id != current_user.id:
         flash('Not authorized.', category='error')
         return redirect(url_for('views.dashboard'))
+    record_exercise(ex, sign=-1)
     db.session.delete(ex)
     db.session.commit()
     flash('Exercise entry deleted.', category='success')
@@ -97,22 +180,69 @@ def delete_exercise(exercise_id):
 
 @views.route('/community', methods=['GET', 'POST'])
 def community():
-    from .models import Post, ChatMessage
-    posts = Post.query.order_by(Post.date.desc()).all()
-    chat_messages = ChatMessage.query.order_by(ChatMessage.date.asc()).limit(50).all()
-    return render_template('community.html', user=current_user, posts=posts, chat_messages=chat_messages)
+    from .feed import get_feed_page, clamp_limit
+    from .community_events import get_broker
+    cursor = request.args.get('before')
+    limit = clamp_limit(request.args.get('limit'))
+    feed_items, next_cursor = get_feed_page(current_user, cursor=cursor, limit=limit)
+    # The chat panel loads its own history from /api/chat/history
+    return render_template('community.html', user=current_user, feed_items=feed_items,
+                           next_cursor=next_cursor, events_after=get_broker().latest_id())
+
+@views.route('/api/community/events')
+def community_events():
+    from .community_events import get_broker, limited_event_stream
+    after_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+    return Response(limited_event_stream(get_broker(), after_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+@views.route('/api/feed')
+def feed_api():
+    from .feed import get_feed_page, clamp_limit
+    cursor = request.args.get('before')
+    limit = clamp_limit(request.args.get('limit'))
+    feed_items, next_cursor = get_feed_page(current_user, cursor=cursor, limit=limit)
+    data = {"posts": [item.to_dict() for item in feed_items], "next_cursor": next_cursor}
+    if request.args.get('format') == 'html':
+        # Rendered for this viewer; the page swaps it in after missing live events
+        data['html'] = render_template('_feed_items.html', feed_items=feed_items)
+    return jsonify(data)
+
+@views.route('/api/posts/<int:post_id>/comments')
+def post_comments_api(post_id):
+    from .feed import get_comments_page, comment_to_dict, clamp_limit
+    before_id = request.args.get('before_id', type=int)
+    limit = clamp_limit(request.args.get('limit'))
+    comments, next_before_id = get_comments_page(post_id, before_id=before_id, limit=limit)
+    # The same fragment the feed renders, so the viewer keeps their delete controls
+    html = [render_template('_comment.html', comment=c) for c in comments]
+    return jsonify(comments=[comment_to_dict(c) for c in comments], html=html, next_before_id=next_before_id)
 
 @views.route('/create-post', methods=['POST'])
 @login_required
 def create_post():
     from .models import Post
+    from .search import index_post
+    from .feed import FeedItem
+    from .community_events import publish
     content = request.form.get('content')
     if content and len(content) <= 500:
         new_post = Post(user_id=current_user.id, content=content)
         db.session.add(new_post)
+        index_post(new_post)
         db.session.commit()
+        item = FeedItem(new_post)
+        publish('post_created', {"post": item.to_dict(),
+                                 "html": render_template('_post_card.html', item=item, broadcast=True)})
+        if wants_json():
+            return jsonify(post=item.to_dict(), html=render_template('_post_card.html', item=item)), 201
         flash('Post created successfully!', category='success')
     else:
+        if wants_json():
+            return jsonify(error='Post content is invalid.'), 400
         flash('Post content is invalid.', category='error')
     return redirect(url_for('views.community'))
 
@@ -120,92 +250,213 @@ def create_post():
 @login_required
 def like_post(post_id):
     from .models import Post
-    post = Post.query.get_or_404(post_id)
-    existing_like = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first()
-    
-    if existing_like:
-        db.session.delete(existing_like)
-        db.session.commit()
-        flash('Post unliked.', category='success')
-    else:
-        new_like = Like(user_id=current_user.id, post_id=post_id)
-        db.session.add(new_like)
-        db.session.commit()
+    from .counters import toggle_like
+    from .community_events import publish
+    Post.query.get_or_404(post_id)
+    liked, like_count = toggle_like(current_user.id, post_id)
+    publish('like', {"post_id": post_id, "like_count": like_count})
+    if liked:
         flash('Post liked!', category='success')
+    else:
+        flash('Post unliked.', category='success')
     return redirect(url_for('views.community'))
 
+@views.route('/api/posts/<int:post_id>/like', methods=['POST'])
+@login_required
+def like_post_api(post_id):
+    from .models import Post
+    from .counters import set_like, toggle_like
+    from .community_events import publish
+    Post.query.get_or_404(post_id)
+    data = request.get_json(silent=True) or {}
+    if 'liked' in data:
+        liked = bool(data['liked'])
+        like_count = set_like(current_user.id, post_id, liked)
+    else:
+        liked, like_count = toggle_like(current_user.id, post_id)
+    publish('like', {"post_id": post_id, "like_count": like_count})
+    return jsonify(post_id=post_id, liked=liked, like_count=like_count)
+
 @views.route('/delete-post/<int:post_id>', methods=['POST'])
 @login_required
 def delete_post(post_id):
     from .models import Post
+    from .search import unindex_post
+    from .community_events import publish
+    from .fragment_cache import fragment_cache
     post = Post.query.get_or_404(post_id)
     if post.user_id == current_user.id:
+        unindex_post(post.id)
         db.session.delete(post)
         db.session.commit()
+        fragment_cache.invalidate('post-body', post_id)
+        publish('post_deleted', {"id": post_id})
+        if wants_json():
+            return jsonify(deleted=post_id)
         flash('Post deleted.', category='success')
+    elif wants_json():
+        return jsonify(error='Not authorized.'), 403
     return redirect(url_for('views.community'))
 
 @views.route('/add-comment/<int:post_id>', methods=['POST'])
 @login_required
 def add_comment(post_id):
-    from .models import Comment
+    from .models import Comment, Post
+    from .counters import bump_comment_count, get_comment_count
+    from .feed import comment_to_dict
+    from .community_events import publish
+    Post.query.get_or_404(post_id)
     content = request.form.get('content')
     if content and len(content) <= 300:
         new_comment = Comment(user_id=current_user.id, post_id=post_id, content=content)
         db.session.add(new_comment)
+        bump_comment_count(post_id, 1)
         db.session.commit()
+        data = {"comment": comment_to_dict(new_comment), "comment_count": get_comment_count(post_id)}
+        publish('comment_created', dict(data, html=render_template('_comment.html', comment=new_comment, broadcast=True)))
+        if wants_json():
+            return jsonify(dict(data, html=render_template('_comment.html', comment=new_comment))), 201
         flash('Comment added!', category='success')
+    elif wants_json():
+        return jsonify(error='Comment content is invalid.'), 400
     return redirect(url_for('views.community'))
 
 @views.route('/delete-comment/<int:comment_id>', methods=['POST'])
 @login_required
 def delete_comment(comment_id):
     from .models import Comment
+    from .counters import bump_comment_count, get_comment_count
+    from .community_events import publish
+    from .fragment_cache import fragment_cache
     comment = Comment.query.get_or_404(comment_id)
     if comment.user_id == current_user.id:
+        post_id = comment.post_id
         db.session.delete(comment)
+        bump_comment_count(post_id, -1)
         db.session.commit()
+        fragment_cache.invalidate('comment-body', comment_id)
+        publish('comment_deleted', {"id": comment_id, "post_id": post_id, "comment_count": get_comment_count(post_id)})
+        if wants_json():
+            return jsonify(deleted=comment_id)
         flash('Comment deleted.', category='success')
+    elif wants_json():
+        return jsonify(error='Not authorized.'), 403
     return redirect(url_for('views.community'))
 
 from .models import ChatMessage
-from .ai_agent import ask_ai
 
 @views.route('/send-message', methods=['POST'])
 @login_required
 def send_message():
+    from .chat_jobs import submit_reply, message_to_dict, validate_chat_message
     user_message = request.form.get('message')
     
-    if not user_message or len(user_message.strip()) == 0:
-        flash('Message cannot be empty.', category='error')
-        return redirect(url_for('views.community'))
-    
-    if len(user_message) > 500:
-        flash('Message too long. Max 500 characters.', category='error')
+    error = validate_chat_message(user_message)
+    if error:
+        if wants_json():
+            return jsonify(error=error), 400
+        flash(error, category='error')
         return redirect(url_for('views.community'))
     
     new_user_msg = ChatMessage(
         user_id=current_user.id,
         message=user_message,
-        sender='user'
+        sender='user',
+        status='pending'
     )
     db.session.add(new_user_msg)
     db.session.commit()
     
-    chat_history = ChatMessage.query.filter_by(user_id=current_user.id).order_by(ChatMessage.id).all()
+    submit_reply(new_user_msg)
     
-    ai_response = ask_ai(user_message, chat_history)
-    
-    new_bot_msg = ChatMessage(
+    if wants_json():
+        return jsonify(message=message_to_dict(new_user_msg)), 202
+    flash('Message sent!', category='success')
+    return redirect(url_for('views.community'))
+
+@views.route('/send-message/stream', methods=['POST'])
+@login_required
+def send_message_stream():
+    from .chat_jobs import stream_reply, validate_chat_message, sse_event, message_to_dict
+    user_message = request.form.get('message')
+    error = validate_chat_message(user_message)
+    if error:
+        return jsonify(error=error), 400
+
+    new_user_msg = ChatMessage(
         user_id=current_user.id,
-        message=ai_response,
-        sender='bot'
+        message=user_message,
+        sender='user',
+        status='pending'
     )
-    db.session.add(new_bot_msg)
+    db.session.add(new_user_msg)
     db.session.commit()
-    
-    flash('Message sent!', category='success')
-    return redirect(url_for('views.community'))
+
+    def events():
+        yield sse_event('message', message_to_dict(new_user_msg))
+        yield from stream_reply(new_user_msg)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@views.route('/api/chat/messages')
+@login_required
+def chat_messages_api():
+    from .chat_jobs import get_messages_after, message_to_dict
+    after_id = request.args.get('after_id', 0, type=int)
+    messages, pending = get_messages_after(current_user.id, after_id)
+    return jsonify(messages=[message_to_dict(m) for m in messages], pending=pending)
+
+@views.route('/api/chat/history')
+@login_required
+def chat_history_api():
+    from .chat_jobs import get_messages_before, message_to_dict, CHAT_PAGE_SIZE, MAX_CHAT_PAGE_SIZE
+    from .feed import clamp_limit
+    before_id = request.args.get('before_id', type=int)
+    limit = clamp_limit(request.args.get('limit'), default=CHAT_PAGE_SIZE, maximum=MAX_CHAT_PAGE_SIZE)
+    messages, next_before_id = get_messages_before(current_user.id, before_id=before_id, limit=limit)
+    return jsonify(messages=[message_to_dict(m) for m in messages], next_before_id=next_before_id)
+
+def run_search(query, scope, page):
+    from .catalogue import get_catalogue
+    from .search import search_exercises, search_posts
+    exercises, more_exercises = [], False
+    posts, more_posts = [], False
+    if scope in ('all', 'exercises'):
+        exercises, more_exercises = search_exercises(get_catalogue(), query, page)
+    if scope in ('all', 'posts'):
+        posts, more_posts = search_posts(query, page)
+    return exercises, posts, more_exercises or more_posts
+
+def search_args():
+    from .search import MAX_SEARCH_PAGE
+    query = request.args.get('q', '').strip()[:200]
+    scope = request.args.get('type', 'all')
+    if scope not in ('all', 'exercises', 'posts'):
+        scope = 'all'
+    page = min(max(request.args.get('page', 1, type=int), 1), MAX_SEARCH_PAGE)
+    return query, scope, page
+
+@views.route('/search')
+def search():
+    query, scope, page = search_args()
+    exercises, posts, has_more = run_search(query, scope, page) if query else ([], [], False)
+    return render_template('search.html', user=current_user, query=query, scope=scope, page=page,
+                           exercises=exercises, posts=posts, has_more=has_more)
+
+@views.route('/api/search')
+def search_api():
+    from .feed import FeedItem
+    query, scope, page = search_args()
+    exercises, posts, has_more = run_search(query, scope, page) if query else ([], [], False)
+    return jsonify(
+        query=query,
+        page=page,
+        has_more=has_more,
+        exercises=[{"id": e.id, "name": e.name, "description": e.description,
+                    "difficulty": e.difficulty, "exercise_type": e.exercise_type} for e in exercises],
+        posts=[FeedItem(p, like_count=p.likes_count, comment_count=p.comments_count).to_dict() for p in posts],
+    )
 
 @views.route('/myaccount', methods=['GET', 'POST'])
 def myaccount():
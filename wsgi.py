@@ -0,0 +1,20 @@
+"""
+Production entry point.
+
+    flask --app wsgi bootstrap-db          # once per deploy: schema, indexes, backfills
+    gunicorn -c gunicorn.conf.py wsgi:app  # multi-worker, multi-threaded serving
+
+Workers skip the schema bootstrap (set DB_AUTO_BOOTSTRAP=1 to run it anyway), so
+starting one costs only imports and app setup; /readyz reports the timings.
+"""
+import os
+import time
+
+started = time.perf_counter()
+
+from website import create_app
+from website.config import env_bool
+
+app = create_app({'DB_AUTO_BOOTSTRAP': env_bool('DB_AUTO_BOOTSTRAP', False)})
+app.extensions['startup']['load_seconds'] = round(time.perf_counter() - started, 4)
+print(f"App loaded in {app.extensions['startup']['load_seconds']:.2f}s (pid {os.getpid()}).")